@@ -0,0 +1,363 @@
+"""
+Ingestion benchmark.
+
+Generates a synthetic git repository, then times `load_docs`, `split_docs` and
+the full `process()` path (full reload, a re-run with no changes, and a re-run
+after editing a share of the files). Embeddings come from a deterministic fake
+embedder and vectors go to an embedded Qdrant, so the benchmark runs offline.
+Each stage runs in a fresh process so that its peak RSS is its own.
+
+    python benchmarks/ingest.py --files 2000 --mix py=5,js=3,java=1,md=1 --workers 4
+
+Results are written as JSON to `benchmarks/results/`; pass a previous result
+with `--baseline` to print the speedup of each stage.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+_BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+_ROOT_DIR = os.path.dirname(_BENCH_DIR)
+
+# Keep the benchmark's state away from the user's index and embedding cache.
+# Set before `configs` is imported, here and in the spawned stage processes.
+if "CHAT2CODE_BENCH_DIR" not in os.environ:
+    os.environ["CHAT2CODE_BENCH_DIR"] = tempfile.mkdtemp(prefix="chat2code-bench-")
+_WORK_DIR = os.environ["CHAT2CODE_BENCH_DIR"]
+os.environ["INDEX_STATE_DIR"] = os.path.join(_WORK_DIR, "state")
+os.environ["QDRANT_PATH"] = os.path.join(_WORK_DIR, "qdrant")
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+os.environ.pop("QDRANT_URL", None)
+
+sys.path[:0] = [os.path.join(_ROOT_DIR, "src"), _ROOT_DIR]
+
+from langchain_core.embeddings import Embeddings
+
+COLLECTION_NAME = "chat2code-bench"
+DEFAULT_MIX = "py=5,js=3,java=1,md=1"
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic embeddings derived from the SHA-256 of each text, with an optional per-call latency."""
+
+    def __init__(self, size=1536, latency=0.0):
+        self.dimensions = size
+        self.latency = latency
+
+    def _vector(self, text):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        rng = random.Random(digest)
+        return [rng.uniform(-1, 1) for _ in range(self.dimensions)]
+
+    def embed_documents(self, texts):
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def _python_file(rng, index, units):
+    parts = [f'"""Synthetic module {index}."""\n\nimport os\n\n']
+    for i in range(units):
+        parts.append(
+            f"class Service{index}_{i}:\n"
+            f'    """Handle requests of kind {i}."""\n\n'
+            f"    def __init__(self, name):\n"
+            f"        self.name = name\n"
+            f"        self.count = {rng.randint(0, 1000)}\n\n"
+            f"    def handle_{i}(self, payload):\n"
+            f"        if not payload:\n"
+            f"            return None\n"
+            f"        total = 0\n"
+            f"        for item in payload:\n"
+            f"            total += len(str(item)) * {rng.randint(1, 9)}\n"
+            f"        return os.path.join(self.name, str(total))\n\n\n"
+            f"def helper_{index}_{i}(value):\n"
+            f"    return [value] * {rng.randint(1, 5)}\n\n\n"
+        )
+    return "".join(parts)
+
+
+def _js_file(rng, index, units):
+    parts = [f"// Synthetic module {index}\n\n"]
+    for i in range(units):
+        parts.append(
+            f"export class Widget{index}_{i} {{\n"
+            f"  constructor(name) {{\n"
+            f"    this.name = name;\n"
+            f"    this.count = {rng.randint(0, 1000)};\n"
+            f"  }}\n\n"
+            f"  render(items) {{\n"
+            f"    return items.map((item) => `${{this.name}}:${{item}}`).join(',');\n"
+            f"  }}\n"
+            f"}}\n\n"
+            f"export const helper{index}_{i} = (value) => value * {rng.randint(1, 9)};\n\n"
+        )
+    return "".join(parts)
+
+
+def _java_file(rng, index, units):
+    parts = [f"package bench;\n\npublic class Model{index} {{\n"]
+    for i in range(units):
+        parts.append(
+            f"    private int field{i} = {rng.randint(0, 1000)};\n\n"
+            f"    public int compute{i}(int value) {{\n"
+            f"        int total = field{i};\n"
+            f"        for (int j = 0; j < value; j++) {{\n"
+            f"            total += j * {rng.randint(1, 9)};\n"
+            f"        }}\n"
+            f"        return total;\n"
+            f"    }}\n\n"
+        )
+    parts.append("}\n")
+    return "".join(parts)
+
+
+def _markdown_file(rng, index, units):
+    parts = [f"# Document {index}\n\n"]
+    words = ["index", "query", "vector", "chunk", "repository", "search", "answer", "token"]
+    for i in range(units):
+        sentence = " ".join(rng.choice(words) for _ in range(40))
+        parts.append(f"## Section {i}\n\n{sentence}.\n\n")
+    return "".join(parts)
+
+
+GENERATORS = {
+    "py": _python_file,
+    "js": _js_file,
+    "java": _java_file,
+    "md": _markdown_file,
+}
+
+
+def parse_mix(mix):
+    """Parse `py=5,js=3` into `{"py": 5, "js": 3}`."""
+    weights = {}
+    for part in mix.split(","):
+        extension, _, weight = part.partition("=")
+        if extension not in GENERATORS:
+            raise ValueError(f"Unknown extension {extension!r}, expected one of {sorted(GENERATORS)}")
+        weights[extension] = float(weight or 1)
+    return weights
+
+
+def _git(repo_dir, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=bench", "-c", "user.email=bench@localhost", "-C", repo_dir, *args],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def generate_repository(repo_dir, files, mix, units, seed):
+    """Write a git repository of `files` synthetic source files and return their paths."""
+    rng = random.Random(seed)
+    extensions = list(mix)
+    weights = [mix[extension] for extension in extensions]
+    paths = []
+    for index in range(files):
+        extension = rng.choices(extensions, weights)[0]
+        rel_path = os.path.join(f"pkg{index % 50}", f"module_{index}.{extension}")
+        file_path = os.path.join(repo_dir, rel_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(GENERATORS[extension](rng, index, rng.randint(1, units)))
+        paths.append(rel_path)
+    _git(repo_dir, "init", "-q")
+    _git(repo_dir, "add", "-A")
+    _git(repo_dir, "commit", "-q", "-m", "Synthetic repository")
+    return paths
+
+
+def edit_repository(repo_dir, paths, share, seed):
+    """Append a line to `share` of the files and commit, returning the number edited."""
+    rng = random.Random(seed + 1)
+    edited = rng.sample(paths, max(1, int(len(paths) * share)))
+    for rel_path in edited:
+        with open(os.path.join(repo_dir, rel_path), "a", encoding="utf-8") as f:
+            f.write(f"\n// edited {rng.random()}\n")
+    _git(repo_dir, "commit", "-q", "-am", "Edit files")
+    return len(edited)
+
+
+def _peak_rss_mb():
+    """Peak RSS of this process and of its finished children, in MiB (Linux reports KiB)."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def run_stage(stage, config):
+    """Run one stage in the current process and return its measurements."""
+    from utils.process import load_docs, process, split_docs
+
+    extensions = [f".{extension}" for extension in config["mix"]]
+    files = config["files"]
+    chunks = 0
+    stage_seconds = None
+    if stage == "load_docs":
+        start = time.perf_counter()
+        docs = load_docs(config["repo_dir"], extensions, workers=config["workers"])
+        seconds = time.perf_counter() - start
+        files = len(docs)
+    elif stage == "split_docs":
+        docs = load_docs(config["repo_dir"], extensions, workers=config["workers"])
+        start = time.perf_counter()
+        chunks = len(split_docs(docs))
+        seconds = time.perf_counter() - start
+    else:
+        embeddings = FakeEmbeddings(config["vector_size"], config["embed_latency"])
+        summary_path = os.path.join(_WORK_DIR, f"{stage}.json")
+        start = time.perf_counter()
+        stats = process(
+            config["repo_dir"],
+            extensions,
+            COLLECTION_NAME,
+            config["clone_dir"],
+            full_reload=stage == "process_full",
+            workers=config["workers"],
+            embeddings=embeddings,
+            summary_path=summary_path,
+        )
+        seconds = time.perf_counter() - start
+        with open(summary_path, encoding="utf-8") as f:
+            stage_seconds = json.load(f)["stage_seconds"]
+        chunks = stats["chunks_added"]
+        if stage == "process_incremental":
+            files = stats["files_changed"]
+    return {
+        "stage": stage,
+        "seconds": round(seconds, 4),
+        "files": files,
+        "chunks": chunks,
+        "files_per_s": round(files / seconds, 2) if seconds else None,
+        "chunks_per_s": round(chunks / seconds, 2) if seconds else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        # Time spent in each stage of process(), which overlap
+        "stage_seconds": stage_seconds,
+    }
+
+
+def run_isolated(stage, config):
+    """Run a stage in a fresh spawned process so its peak RSS is measured on its own."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(run_stage, stage, config).result()
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "-C", _ROOT_DIR, "rev-parse", "--short", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    baseline_stages = {}
+    if baseline:
+        baseline_stages = {result["stage"]: result for result in baseline["results"]}
+    print(f"{'stage':<22}{'seconds':>10}{'files/s':>12}{'chunks/s':>12}{'peak MiB':>10}{'speedup':>10}")
+    for result in results:
+        speedup = ""
+        previous = baseline_stages.get(result["stage"])
+        if previous and result["seconds"]:
+            speedup = f"{previous['seconds'] / result['seconds']:.2f}x"
+        print(
+            f"{result['stage']:<22}{result['seconds']:>10.3f}{result['files_per_s'] or 0:>12.1f}"
+            f"{result['chunks_per_s'] or 0:>12.1f}{result['peak_rss_mb']:>10.1f}{speedup:>10}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark repository ingestion offline")
+    parser.add_argument("--files", type=int, default=500, help="Number of files in the synthetic repository.")
+    parser.add_argument(
+        "--mix",
+        default=DEFAULT_MIX,
+        help=f"Relative weights of the file types, from {sorted(GENERATORS)}. Defaults to {DEFAULT_MIX}.",
+    )
+    parser.add_argument("--units", type=int, default=20, help="Max classes or sections per file.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to load and split files.")
+    parser.add_argument("--vector-size", type=int, default=1536, help="Size of the fake embeddings.")
+    parser.add_argument(
+        "--embed-latency",
+        type=float,
+        default=0.0,
+        help="Seconds the fake embedder sleeps per call, to mimic a remote model.",
+    )
+    parser.add_argument("--edit-share", type=float, default=0.1, help="Share of the files edited before the incremental run.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Result JSON path. Defaults to benchmarks/results/<time>-<commit>.json.")
+    parser.add_argument("--baseline", help="A previous result JSON to compare against.")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    repo_dir = os.path.join(_WORK_DIR, "repo")
+    config = {
+        "files": args.files,
+        "mix": mix,
+        "units": args.units,
+        "workers": args.workers,
+        "vector_size": args.vector_size,
+        "embed_latency": args.embed_latency,
+        "edit_share": args.edit_share,
+        "seed": args.seed,
+        "repo_dir": repo_dir,
+        "clone_dir": os.path.join(_WORK_DIR, "clone"),
+    }
+
+    try:
+        paths = generate_repository(repo_dir, args.files, mix, args.units, args.seed)
+        results = [
+            run_isolated(stage, config)
+            for stage in ["load_docs", "split_docs", "process_full", "process_unchanged"]
+        ]
+        edit_repository(repo_dir, paths, args.edit_share, args.seed)
+        results.append(run_isolated("process_incremental", config))
+    finally:
+        shutil.rmtree(_WORK_DIR, ignore_errors=True)
+
+    report = {
+        "commit": current_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in config.items() if not key.endswith("_dir")},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        _BENCH_DIR, "results", f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit'] or 'unknown'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,32 @@ import os
 GITLAB_CONNECTOR_INCLUDE_CODE_FILES = (
     os.environ.get("GITLAB_CONNECTOR_INCLUDE_CODE_FILES", "").lower() == "true"
 )
+# Number of file contents the GitLab connector fetches concurrently
+try:
+    GITLAB_CONNECTOR_FETCH_WORKERS = int(
+        os.environ.get("GITLAB_CONNECTOR_FETCH_WORKERS", 8)
+    )
+except ValueError:
+    GITLAB_CONNECTOR_FETCH_WORKERS = 8
+# Retries of a GitLab request that was rate limited or failed transiently
+try:
+    GITLAB_CONNECTOR_MAX_RETRIES = int(os.environ.get("GITLAB_CONNECTOR_MAX_RETRIES", 5))
+except ValueError:
+    GITLAB_CONNECTOR_MAX_RETRIES = 5
+# Pause GitLab requests until the rate limit resets once fewer requests than this remain
+try:
+    GITLAB_CONNECTOR_RATE_LIMIT_FLOOR = int(
+        os.environ.get("GITLAB_CONNECTOR_RATE_LIMIT_FLOOR", 10)
+    )
+except ValueError:
+    GITLAB_CONNECTOR_RATE_LIMIT_FLOOR = 10
+# Branch the GitLab connector indexes code from, the project's default branch if empty
+GITLAB_CONNECTOR_BRANCH = os.environ.get("GITLAB_CONNECTOR_BRANCH", "")
+# How the GitLab connector fetches code: "archive" downloads one tarball of the
+# branch, "files" lists the tree and fetches each file through the API
+GITLAB_CONNECTOR_CODE_FETCH_MODE = os.environ.get(
+    "GITLAB_CONNECTOR_CODE_FETCH_MODE", "archive"
+).lower()
 
 # Number of documents in a batch during indexing (further batching done by chunks before passing to bi-encoder)
 try:
@@ -13,3 +39,172 @@ except ValueError:
 
 # notset, debug, info, warning, error, or critical
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "info")
+
+# Local directory for indexing state (manifests, caches, checkpoints)
+INDEX_STATE_DIR = os.environ.get("INDEX_STATE_DIR", ".chat2code")
+# Sync state of connectors, such as the last indexed commit of each GitLab branch
+CONNECTOR_STATE_DIR = os.environ.get(
+    "CONNECTOR_STATE_DIR", os.path.join(INDEX_STATE_DIR, "connectors")
+)
+
+# On-disk cache of embeddings keyed by (model, text hash), shared by ingestion and queries
+EMBEDDING_CACHE_ENABLED = (
+    os.environ.get("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+)
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH", os.path.join(INDEX_STATE_DIR, "embedding_cache.sqlite")
+)
+try:
+    EMBEDDING_CACHE_MAX_ENTRIES = int(
+        os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", 1_000_000)
+    )
+except ValueError:
+    EMBEDDING_CACHE_MAX_ENTRIES = 1_000_000
+
+# Embedding backend for both ingestion and queries: "openai" or "local" (CPU inference)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "openai").lower()
+LOCAL_EMBEDDING_MODEL = os.environ.get(
+    "LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+)
+# "torch" or "onnx" runtime for the local embedding model
+LOCAL_EMBEDDING_RUNTIME = os.environ.get("LOCAL_EMBEDDING_RUNTIME", "torch").lower()
+try:
+    LOCAL_EMBEDDING_BATCH_SIZE = int(os.environ.get("LOCAL_EMBEDDING_BATCH_SIZE", 32))
+except ValueError:
+    LOCAL_EMBEDDING_BATCH_SIZE = 32
+# CPU threads used by the local embedding model, 0 keeps the runtime default
+try:
+    LOCAL_EMBEDDING_THREADS = int(os.environ.get("LOCAL_EMBEDDING_THREADS", 0))
+except ValueError:
+    LOCAL_EMBEDDING_THREADS = 0
+
+# Max number of items buffered between ingestion pipeline stages
+try:
+    PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", 8))
+except ValueError:
+    PIPELINE_QUEUE_SIZE = 8
+# Files loaded in the calling process before --workers starts its process pool,
+# whose startup costs more than loading and splitting a few files
+try:
+    PROCESS_POOL_MIN_ITEMS = int(os.environ.get("PROCESS_POOL_MIN_ITEMS", 256))
+except ValueError:
+    PROCESS_POOL_MIN_ITEMS = 256
+# Seconds between two progress lines logged while indexing
+try:
+    PROGRESS_LOG_INTERVAL_SECONDS = float(os.environ.get("PROGRESS_LOG_INTERVAL_SECONDS", 10))
+except ValueError:
+    PROGRESS_LOG_INTERVAL_SECONDS = 10.0
+
+# Poll scheduler keeping many connectors fresh: seconds between polls of an
+# active connector, up to which idle connectors back off, and up to which
+# failing connectors back off
+try:
+    SCHEDULER_POLL_INTERVAL_SECONDS = float(
+        os.environ.get("SCHEDULER_POLL_INTERVAL_SECONDS", 120)
+    )
+except ValueError:
+    SCHEDULER_POLL_INTERVAL_SECONDS = 120.0
+try:
+    SCHEDULER_MAX_IDLE_INTERVAL_SECONDS = float(
+        os.environ.get("SCHEDULER_MAX_IDLE_INTERVAL_SECONDS", 600)
+    )
+except ValueError:
+    SCHEDULER_MAX_IDLE_INTERVAL_SECONDS = 600.0
+try:
+    SCHEDULER_MAX_ERROR_BACKOFF_SECONDS = float(
+        os.environ.get("SCHEDULER_MAX_ERROR_BACKOFF_SECONDS", 3600)
+    )
+except ValueError:
+    SCHEDULER_MAX_ERROR_BACKOFF_SECONDS = 3600.0
+# Connectors polled at once, in total and per source host
+try:
+    SCHEDULER_WORKERS = int(os.environ.get("SCHEDULER_WORKERS", 16))
+except ValueError:
+    SCHEDULER_WORKERS = 16
+try:
+    SCHEDULER_PER_HOST_CONCURRENCY = int(
+        os.environ.get("SCHEDULER_PER_HOST_CONCURRENCY", 4)
+    )
+except ValueError:
+    SCHEDULER_PER_HOST_CONCURRENCY = 4
+
+# Maximum size of an indexed chunk, in tokens of the tiktoken encoding below
+try:
+    CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", 512))
+except ValueError:
+    CHUNK_TOKENS = 512
+CHUNK_TOKENIZER = os.environ.get("CHUNK_TOKENIZER", "cl100k_base")
+
+# HTTP connection pools shared by the API server for OpenAI and Qdrant requests
+try:
+    API_HTTP_MAX_CONNECTIONS = int(os.environ.get("API_HTTP_MAX_CONNECTIONS", 100))
+except ValueError:
+    API_HTTP_MAX_CONNECTIONS = 100
+try:
+    API_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(
+        os.environ.get("API_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)
+    )
+except ValueError:
+    API_HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+try:
+    API_HTTP_TIMEOUT = float(os.environ.get("API_HTTP_TIMEOUT", 60))
+except ValueError:
+    API_HTTP_TIMEOUT = 60.0
+# Use qdrant-client's AsyncQdrantClient for searches in the API server
+QDRANT_USE_ASYNC_CLIENT = (
+    os.environ.get("QDRANT_USE_ASYNC_CLIENT", "").lower() == "true"
+)
+
+# Semantic cache of answers to first questions, matched by query embedding similarity
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+try:
+    ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", 0.95))
+except ValueError:
+    ANSWER_CACHE_SIMILARITY = 0.95
+try:
+    ANSWER_CACHE_TTL_SECONDS = int(os.environ.get("ANSWER_CACHE_TTL_SECONDS", 3600))
+except ValueError:
+    ANSWER_CACHE_TTL_SECONDS = 3600
+try:
+    ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", 1000))
+except ValueError:
+    ANSWER_CACHE_MAX_ENTRIES = 1000
+
+# Max tokens of earlier conversation turns sent to the model with a question
+try:
+    HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", 2000))
+except ValueError:
+    HISTORY_TOKEN_BUDGET = 2000
+# Rewrite follow-up questions into standalone ones with the model before retrieval
+HISTORY_CONDENSE_QUESTION = (
+    os.environ.get("HISTORY_CONDENSE_QUESTION", "").lower() == "true"
+)
+
+# Bearer token of the API server's admin endpoints, which are disabled when empty
+API_ADMIN_TOKEN = os.environ.get("API_ADMIN_TOKEN", "")
+# Number of collections the API server keeps warm vector store and chain handles for
+try:
+    API_MAX_COLLECTIONS = int(os.environ.get("API_MAX_COLLECTIONS", 32))
+except ValueError:
+    API_MAX_COLLECTIONS = 32
+# How long the API server trusts its list of Qdrant collections before refreshing it
+try:
+    API_COLLECTION_LIST_TTL_SECONDS = int(
+        os.environ.get("API_COLLECTION_LIST_TTL_SECONDS", 60)
+    )
+except ValueError:
+    API_COLLECTION_LIST_TTL_SECONDS = 60
+
+# Query-time Qdrant search parameters, 0 keeps the collection defaults
+try:
+    QDRANT_HNSW_EF = int(os.environ.get("QDRANT_HNSW_EF", 0))
+except ValueError:
+    QDRANT_HNSW_EF = 0
+# Candidates fetched with quantized vectors per result, then rescored with the originals
+try:
+    QDRANT_OVERSAMPLING = float(os.environ.get("QDRANT_OVERSAMPLING", 0))
+except ValueError:
+    QDRANT_OVERSAMPLING = 0.0
+
+# Embedded Qdrant storage: a directory, or ":memory:", used instead of the QDRANT_URL server
+QDRANT_PATH = os.environ.get("QDRANT_PATH", "")
@@ -1,17 +1,30 @@
 import fnmatch
+import io
 import itertools
+import tarfile
+import random
+import threading
+import time
 from collections import deque
+from collections.abc import Callable
 from collections.abc import Iterable
 from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from datetime import timezone
 from typing import Any
 
 import gitlab
-import pytz
+import requests
 from gitlab.v4.objects import Project
+from requests.adapters import HTTPAdapter
 
+from configs.app_configs import GITLAB_CONNECTOR_BRANCH
+from configs.app_configs import GITLAB_CONNECTOR_CODE_FETCH_MODE
+from configs.app_configs import GITLAB_CONNECTOR_FETCH_WORKERS
 from configs.app_configs import GITLAB_CONNECTOR_INCLUDE_CODE_FILES
+from configs.app_configs import GITLAB_CONNECTOR_MAX_RETRIES
+from configs.app_configs import GITLAB_CONNECTOR_RATE_LIMIT_FLOOR
 from configs.app_configs import INDEX_BATCH_SIZE
 from configs.constants import DocumentSource
 from connectors.interfaces import GenerateDocumentsOutput
@@ -22,6 +35,7 @@ from connectors.models import BasicExpertInfo
 from connectors.models import ConnectorMissingCredentialError
 from connectors.models import Document
 from connectors.models import Section
+from connectors.state_store import ConnectorStateStore
 from utils.logger import setup_logger
 
 from dotenv import load_dotenv
@@ -36,6 +50,17 @@ exclude_patterns = [
 ]
 logger = setup_logger()
 
+# Longest pause before retrying GitLab, in seconds
+_MAX_BACKOFF_SECONDS = 60.0
+
+CODE_FETCH_MODES = ["archive", "files"]
+
+# The compare API lists at most this many changed files, a longer diff may be truncated
+_COMPARE_MAX_FILES = 1000
+
+# Git file mode of submodules, which have no content to fetch
+_SUBMODULE_MODE = "160000"
+
 
 def _batch_gitlab_objects(
     git_objs: Iterable[Any], batch_size: int
@@ -48,6 +73,11 @@ def _batch_gitlab_objects(
         yield batch
 
 
+def _parse_gitlab_datetime(value: str) -> datetime:
+    """Parse a GitLab API timestamp, such as 2024-05-01T12:30:00.000+02:00, to UTC."""
+    return datetime.fromisoformat(value).astimezone(timezone.utc)
+
+
 def get_author(author: Any) -> BasicExpertInfo:
     return BasicExpertInfo(
         display_name=author.get("name"),
@@ -60,10 +90,9 @@ def _convert_merge_request_to_document(mr: Any) -> Document:
         sections=[Section(link=mr.web_url, text=mr.description or "")],
         source=DocumentSource.GITLAB,
         semantic_identifier=mr.title,
-        # updated_at is UTC time but is timezone unaware, explicitly add UTC
-        # as there is logic in indexing to prevent wrong timestamped docs
-        # due to local time discrepancies with UTC
-        doc_updated_at=mr.updated_at.replace(tzinfo=timezone.utc),
+        # Parsed once here with fromisoformat, which is much cheaper than strptime,
+        # to an aware UTC time as indexing relies on it to order updates
+        doc_updated_at=_parse_gitlab_datetime(mr.updated_at),
         primary_owners=[get_author(mr.author)],
         metadata={"state": mr.state, "type": "MergeRequest"},
     )
@@ -76,47 +105,212 @@ def _convert_issue_to_document(issue: Any) -> Document:
         sections=[Section(link=issue.web_url, text=issue.description or "")],
         source=DocumentSource.GITLAB,
         semantic_identifier=issue.title,
-        # updated_at is UTC time but is timezone unaware, explicitly add UTC
-        # as there is logic in indexing to prevent wrong timestamped docs
-        # due to local time discrepancies with UTC
-        doc_updated_at=issue.updated_at.replace(tzinfo=timezone.utc),
+        # Parsed once here with fromisoformat, which is much cheaper than strptime,
+        # to an aware UTC time as indexing relies on it to order updates
+        doc_updated_at=_parse_gitlab_datetime(issue.updated_at),
         primary_owners=[get_author(issue.author)],
         metadata={"state": issue.state, "type": issue.type if issue.type else "Issue"},
     )
     return doc
 
 
+def _code_file_url(
+    url: str, projectName: str, projectOwner: str, ref: str, path: str
+) -> str:
+    return f"{url}/{projectOwner}/{projectName}/-/blob/{ref}/{path}"
+
+
 def _convert_code_to_document(
-    project: Project, file: Any, url: str, projectName: str, projectOwner: str
+    file: Any,
+    content: bytes,
+    url: str,
+    projectName: str,
+    projectOwner: str,
+    ref: str,
+    updated_at: datetime,
 ) -> Document:
-    file_content_obj = project.files.get(
-        file_path=file["path"], ref="master"
-    )  # Replace 'master' with your branch name if needed
     try:
-        file_content = file_content_obj.decode().decode("utf-8")
+        file_content = content.decode("utf-8")
     except UnicodeDecodeError:
-        file_content = file_content_obj.decode().decode("latin-1")
+        file_content = content.decode("latin-1")
 
-    file_url = f"{url}/{projectOwner}/{projectName}/-/blob/master/{file['path']}"  # Construct the file URL
+    file_url = _code_file_url(url, projectName, projectOwner, ref, file["path"])
     doc = Document(
-        id=file["id"],
+        # The URL names the file on the branch, so new versions of the file
+        # replace the previous one and deletions can refer to it
+        id=file_url,
         sections=[Section(link=file_url, text=file_content)],
         source=DocumentSource.GITLAB,
         semantic_identifier=file["name"],
-        doc_updated_at=datetime.now().replace(
-            tzinfo=timezone.utc
-        ),  # Use current time as updated_at
+        doc_updated_at=updated_at,
         primary_owners=[],  # Fill this as needed
         metadata={"type": "CodeFile"},
     )
     return doc
 
 
+def _convert_deleted_code_to_document(
+    path: str, url: str, projectName: str, projectOwner: str, ref: str
+) -> Document:
+    file_url = _code_file_url(url, projectName, projectOwner, ref, path)
+    return Document(
+        id=file_url,
+        sections=[],
+        source=DocumentSource.GITLAB,
+        semantic_identifier=path.rsplit("/", 1)[-1],
+        metadata={"type": "CodeFile"},
+        deleted=True,
+    )
+
+
+class _RateLimiter:
+    """Pause shared by every request to GitLab, set from the responses seen
+    through a session hook. Rate-limited responses pause requests for their
+    `Retry-After`, or back off exponentially while GitLab keeps rejecting
+    them. Successful responses pause requests until the rate limit resets
+    once fewer than `floor` requests remain (`RateLimit-Remaining`)."""
+
+    def __init__(self, floor: int = GITLAB_CONNECTOR_RATE_LIMIT_FLOOR) -> None:
+        self.floor = floor
+        self._resume_at = 0.0
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def _pause(self, seconds: float) -> None:
+        seconds = min(max(seconds, 0.0), _MAX_BACKOFF_SECONDS)
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def observe(self, response: requests.Response, *args: Any, **kwargs: Any) -> None:
+        if response.status_code == 429 or response.status_code >= 500:
+            with self._lock:
+                self._failures += 1
+                failures = self._failures
+            try:
+                delay = float(response.headers["Retry-After"])
+            except (KeyError, ValueError):
+                delay = min(2**failures, _MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.0)
+            logger.info(f"GitLab responded {response.status_code}, pausing requests for {delay:.1f}s")
+            self._pause(delay)
+            return
+
+        if response.ok:
+            with self._lock:
+                self._failures = 0
+            try:
+                remaining = int(response.headers["RateLimit-Remaining"])
+                reset = float(response.headers["RateLimit-Reset"])
+            except (KeyError, ValueError):
+                return
+            if remaining < self.floor:
+                delay = reset - time.time()
+                logger.info(
+                    f"{remaining} GitLab requests left in the rate limit window, pausing for {delay:.1f}s"
+                )
+                self._pause(delay)
+
+
+def _ordered_thread_map(
+    fn: Callable[[Any], Any], items: Iterable[Any], workers: int
+) -> Iterator[Any]:
+    """Apply `fn` to `items` in `workers` threads, yielding results in input
+    order with only a few items per thread in flight."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending: deque = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _iter_code_files(project: Project, ref: str) -> Iterator[Any]:
+    """Yield the blobs of the repository tree of `ref` that are not excluded."""
+    # Fetching using BFS as project.report_tree with recursion causing slow load
+    queue = deque([""])  # Start with the root directory
+    while queue:
+        current_path = queue.popleft()
+        for file in project.repository_tree(path=current_path, ref=ref, all=True):
+            if file["type"] == "blob":
+                if not _should_exclude(file["path"]):
+                    yield file
+            elif file["type"] == "tree":
+                if not _should_exclude_dir(file["path"]):
+                    queue.append(file["path"])
+
+
 def _should_exclude(path: str) -> bool:
     """Check if a path matches any of the exclude patterns."""
     return any(fnmatch.fnmatch(path, pattern) for pattern in exclude_patterns)
 
 
+def _should_exclude_dir(path: str) -> bool:
+    """Check if a directory matches any of the exclude patterns, with or
+    without a trailing slash."""
+    return _should_exclude(path) or _should_exclude(f"{path}/")
+
+
+def _is_excluded_path(path: str) -> bool:
+    """Check if a file path or any of its parent directories is excluded."""
+    parts = path.split("/")
+    return _should_exclude(path) or any(
+        _should_exclude_dir("/".join(parts[:depth])) for depth in range(1, len(parts))
+    )
+
+
+class _ChunkStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks, so that a
+    streamed HTTP body can be read by tarfile without buffering all of it."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def _iter_archive_files(chunks: Iterable[bytes]) -> Iterator[tuple[Any, bytes]]:
+    """Stream-extract a tar.gz repository archive, yielding `(file, content)`
+    for the files that are not excluded. `file` has the `name` and `path` keys
+    of a repository tree entry."""
+    with tarfile.open(fileobj=_ChunkStream(chunks), mode="r|gz") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            # Archive paths start with a `<project>-<ref>-<sha>/` directory
+            parts = member.name.split("/")[1:]
+            if not parts:
+                continue
+            path = "/".join(parts)
+            if _is_excluded_path(path):
+                continue
+            extracted = archive.extractfile(member)
+            if extracted is None:
+                continue
+            yield {"name": parts[-1], "path": path}, extracted.read()
+
+
 class GitlabConnector(LoadConnector, PollConnector):
     def __init__(
         self,
@@ -127,7 +321,16 @@ class GitlabConnector(LoadConnector, PollConnector):
         include_mrs: bool = True,
         include_issues: bool = True,
         include_code_files: bool = GITLAB_CONNECTOR_INCLUDE_CODE_FILES,
+        fetch_workers: int = GITLAB_CONNECTOR_FETCH_WORKERS,
+        max_retries: int = GITLAB_CONNECTOR_MAX_RETRIES,
+        branch: str | None = GITLAB_CONNECTOR_BRANCH or None,
+        code_fetch_mode: str = GITLAB_CONNECTOR_CODE_FETCH_MODE,
+        state_store: ConnectorStateStore | None = None,
     ) -> None:
+        if code_fetch_mode not in CODE_FETCH_MODES:
+            raise ValueError(
+                f"Unknown code fetch mode {code_fetch_mode!r}, expected one of {CODE_FETCH_MODES}"
+            )
         self.project_owner = project_owner
         self.project_name = project_name
         self.batch_size = batch_size
@@ -135,93 +338,316 @@ class GitlabConnector(LoadConnector, PollConnector):
         self.include_mrs = include_mrs
         self.include_issues = include_issues
         self.include_code_files = include_code_files
+        self.fetch_workers = max(fetch_workers, 1)
+        self.max_retries = max_retries
+        self.branch = branch
+        self.code_fetch_mode = code_fetch_mode
+        # Last synced commit of each branch, so that polls only fetch the files it changed
+        self.state_store = state_store or ConnectorStateStore()
+        self.rate_limiter = _RateLimiter()
         self.gitlab_client: gitlab.Gitlab | None = None
 
     def load_credentials(self, credentials: dict[str, Any]) -> dict[str, Any] | None:
         self.gitlab_client = gitlab.Gitlab(
             credentials["gitlab_url"], private_token=credentials["gitlab_access_token"]
         )
+        # One pooled connection per fetch thread, and every response informs the rate limiter
+        adapter = HTTPAdapter(pool_maxsize=max(self.fetch_workers, 10))
+        self.gitlab_client.session.mount("http://", adapter)
+        self.gitlab_client.session.mount("https://", adapter)
+        self.gitlab_client.session.hooks["response"].append(self.rate_limiter.observe)
         return None
 
+    def _fetch_file_content(self, project: Project, file: Any, ref: str) -> bytes | None:
+        """Fetch the raw content of a blob, or None if it is gone from `ref`."""
+        self.rate_limiter.wait()
+        try:
+            return project.files.raw(
+                file_path=file["path"],
+                ref=ref,
+                max_retries=self.max_retries,
+                retry_transient_errors=True,
+            )
+        except gitlab.exceptions.GitlabGetError as e:
+            if e.response_code != 404:
+                raise
+            logger.warning(f"Skipped {file['path']}: not found at {ref}")
+            return None
+
+    def _fetch_archive_files(self, project: Project, ref: str) -> Iterator[tuple[Any, bytes]]:
+        """Yield `(file, content)` for the code files, from a single tarball of
+        `ref` extracted as it downloads."""
+        self.rate_limiter.wait()
+        chunks = project.repository_archive(
+            sha=ref,
+            format="tar.gz",
+            streamed=True,
+            iterator=True,
+            chunk_size=1 << 16,
+            max_retries=self.max_retries,
+            retry_transient_errors=True,
+        )
+        yield from _iter_archive_files(chunks)
+
+    def _fetch_tree_files(self, project: Project, ref: str) -> Iterator[tuple[Any, bytes]]:
+        """Yield `(file, content)` for the code files in tree order, fetching
+        `fetch_workers` file contents at a time."""
+        contents = _ordered_thread_map(
+            lambda file: (file, self._fetch_file_content(project, file, ref)),
+            _iter_code_files(project, ref),
+            self.fetch_workers,
+        )
+        return ((file, content) for file, content in contents if content is not None)
+
+    def _fetch_commit(self, project: Project, ref: str) -> Any:
+        self.rate_limiter.wait()
+        return project.commits.get(
+            ref, max_retries=self.max_retries, retry_transient_errors=True
+        )
+
+    def _fetch_last_commit_time(
+        self, project: Project, path: str, sha: str
+    ) -> datetime | None:
+        """Return when `path` last changed in the history of `sha`."""
+        self.rate_limiter.wait()
+        # `path` is a python-gitlab argument too, so it is passed as a query parameter
+        commits = project.commits.list(
+            query_parameters={"ref_name": sha, "path": path},
+            per_page=1,
+            get_all=False,
+            max_retries=self.max_retries,
+            retry_transient_errors=True,
+        )
+        return _parse_gitlab_datetime(commits[0].committed_date) if commits else None
+
+    def _fetch_changed_paths(
+        self, project: Project, from_sha: str, to_sha: str
+    ) -> tuple[list[str], list[str]] | None:
+        """Return the paths of the code files changed and deleted between two
+        commits, or None if GitLab cannot list all of them."""
+        self.rate_limiter.wait()
+        try:
+            comparison = project.repository_compare(
+                from_sha,
+                to_sha,
+                straight=True,
+                max_retries=self.max_retries,
+                retry_transient_errors=True,
+            )
+        except gitlab.exceptions.GitlabGetError as e:
+            if e.response_code != 404:
+                raise
+            logger.warning(f"Cannot compare {from_sha} to {to_sha}, it may have been force-pushed away")
+            return None
+        diffs = comparison["diffs"]
+        if comparison.get("compare_timeout") or len(diffs) >= _COMPARE_MAX_FILES:
+            logger.info(f"Too many changes between {from_sha} and {to_sha} to sync incrementally")
+            return None
+
+        changed: list[str] = []
+        deleted: list[str] = []
+        for diff in diffs:
+            if diff["deleted_file"] or diff["renamed_file"]:
+                if not _is_excluded_path(diff["old_path"]):
+                    deleted.append(diff["old_path"])
+            if (
+                not diff["deleted_file"]
+                and diff["b_mode"] != _SUBMODULE_MODE
+                and not _is_excluded_path(diff["new_path"])
+            ):
+                changed.append(diff["new_path"])
+        return changed, deleted
+
+    def _fetch_code_files(
+        self,
+        project: Project,
+        sha: str,
+        ref: str,
+        updated_at: datetime,
+        synced: set[str],
+    ) -> GenerateDocumentsOutput:
+        """Yield every code file at commit `sha` of branch `ref`, as batches of
+        `batch_size` documents, adding their paths to `synced`. Finding the
+        last commit of each file would cost one request per file, so they are
+        all stamped with the time of `sha`."""
+        assert self.gitlab_client is not None
+        if self.code_fetch_mode == "archive":
+            fetched = self._fetch_archive_files(project, sha)
+        else:
+            fetched = self._fetch_tree_files(project, sha)
+        for file_batch in _batch_gitlab_objects(fetched, self.batch_size):
+            synced.update(file["path"] for file, _ in file_batch)
+            yield [
+                _convert_code_to_document(
+                    file,
+                    content,
+                    self.gitlab_client.url,
+                    self.project_name,
+                    self.project_owner,
+                    ref,
+                    updated_at,
+                )
+                for file, content in file_batch
+            ]
+
+    def _fetch_changed_code_files(
+        self,
+        project: Project,
+        changed: list[str],
+        deleted: list[str],
+        sha: str,
+        ref: str,
+        updated_at: datetime,
+    ) -> GenerateDocumentsOutput:
+        """Yield deletion markers for the `deleted` paths, then the `changed`
+        code files at commit `sha` with the time of their last commit, as
+        batches of `batch_size` documents."""
+        assert self.gitlab_client is not None
+        url = self.gitlab_client.url
+
+        def fetch(path: str) -> tuple[Any, bytes | None, datetime | None]:
+            file = {"name": path.rsplit("/", 1)[-1], "path": path}
+            content = self._fetch_file_content(project, file, sha)
+            if content is None:
+                return file, None, None
+            return file, content, self._fetch_last_commit_time(project, path, sha)
+
+        documents = itertools.chain(
+            (
+                _convert_deleted_code_to_document(
+                    path, url, self.project_name, self.project_owner, ref
+                )
+                for path in deleted
+            ),
+            (
+                _convert_code_to_document(
+                    file,
+                    content,
+                    url,
+                    self.project_name,
+                    self.project_owner,
+                    ref,
+                    file_updated_at or updated_at,
+                )
+                for file, content, file_updated_at in _ordered_thread_map(
+                    fetch, changed, self.fetch_workers
+                )
+                if content is not None
+            ),
+        )
+        yield from _batch_gitlab_objects(documents, self.batch_size)
+
+    def _sync_code_files(self, project: Project, incremental: bool) -> GenerateDocumentsOutput:
+        """Yield the code files changed since the last synced commit of the
+        branch, or all of them if `incremental` is False or the branch was
+        never synced. The head commit and the paths of the code files synced
+        are recorded once every batch has been consumed, so an interrupted sync
+        is retried on the next poll, and the files a full fetch no longer finds
+        are yielded as deleted.
+
+        When nothing was pushed since the last sync, this costs a single
+        request for the head commit."""
+        assert self.gitlab_client is not None
+        state_key = (
+            f"gitlab:{self.gitlab_client.url}/{self.project_owner}/{self.project_name}"
+            f"@{self.branch or 'HEAD'}"
+        )
+        state = self.state_store.get(state_key)
+        # HEAD is the default branch, which saves fetching the project to name it
+        head = self._fetch_commit(project, self.branch or "HEAD")
+        if incremental and state and state["sha"] == head.id:
+            logger.info(f"No new commits since {head.short_id}")
+            return
+
+        ref = self.branch or self.gitlab_client.projects.get(project.get_id()).default_branch
+        updated_at = _parse_gitlab_datetime(head.committed_date)
+        # States written before the paths were recorded cannot sync deletions
+        previous_paths = set(state.get("paths", [])) if state else set()
+        paths = None
+        if incremental and state and state["ref"] == ref and "paths" in state:
+            paths = self._fetch_changed_paths(project, state["sha"], head.id)
+        if paths is not None:
+            changed, deleted = paths
+            logger.info(
+                f"Syncing {len(changed)} changed and {len(deleted)} deleted files"
+                f" of {ref} from {state['sha'][:8]} to {head.short_id}"
+            )
+            yield from self._fetch_changed_code_files(
+                project, changed, deleted, head.id, ref, updated_at
+            )
+            synced = (previous_paths - set(deleted)) | set(changed)
+        else:
+            logger.info(f"Fetching all code files of {ref} at {head.short_id}")
+            synced = set()
+            yield from self._fetch_code_files(project, head.id, ref, updated_at, synced)
+            if state:
+                # Documents are named after the branch they were synced from, so
+                # every file of a previous branch is gone from this one
+                gone = previous_paths - synced if state["ref"] == ref else previous_paths
+                if gone:
+                    logger.info(f"Deleting {len(gone)} code files no longer in {ref}")
+                yield from _batch_gitlab_objects(
+                    (
+                        _convert_deleted_code_to_document(
+                            path,
+                            self.gitlab_client.url,
+                            self.project_name,
+                            self.project_owner,
+                            state["ref"],
+                        )
+                        for path in sorted(gone)
+                    ),
+                    self.batch_size,
+                )
+        self.state_store.set(
+            state_key, {"ref": ref, "sha": head.id, "paths": sorted(synced)}
+        )
+
+    def _list_updated(
+        self, manager: Any, start: datetime | None, end: datetime | None
+    ) -> Iterator[Any]:
+        """Lazily list the merge requests or issues of `manager` updated
+        between `start` and `end`, most recently updated first. GitLab filters
+        them, so a poll only fetches the pages of recent updates."""
+        filters = {}
+        if start is not None:
+            filters["updated_after"] = start.isoformat()
+        if end is not None:
+            filters["updated_before"] = end.isoformat()
+        return manager.list(
+            state=self.state_filter,
+            order_by="updated_at",
+            sort="desc",
+            iterator=True,
+            per_page=100,
+            max_retries=self.max_retries,
+            retry_transient_errors=True,
+            **filters,
+        )
+
     def _fetch_from_gitlab(
         self, start: datetime | None = None, end: datetime | None = None
     ) -> GenerateDocumentsOutput:
         if self.gitlab_client is None:
             raise ConnectorMissingCredentialError("Gitlab")
+        # Lazy, requests name the project by its path instead of fetching it first
         project: gitlab.Project = self.gitlab_client.projects.get(
-            f"{self.project_owner}/{self.project_name}"
+            f"{self.project_owner}/{self.project_name}", lazy=True
         )
 
-        # Fetch code files
+        # Code files are synced from the last synced commit rather than by time
         if self.include_code_files:
-            # Fetching using BFS as project.report_tree with recursion causing slow load
-            queue = deque([""])  # Start with the root directory
-            while queue:
-                current_path = queue.popleft()
-                files = project.repository_tree(path=current_path, all=True)
-                for file_batch in _batch_gitlab_objects(files, self.batch_size):
-                    code_doc_batch: list[Document] = []
-                    for file in file_batch:
-                        if _should_exclude(file["path"]):
-                            continue
-
-                        if file["type"] == "blob":
-                            code_doc_batch.append(
-                                _convert_code_to_document(
-                                    project,
-                                    file,
-                                    self.gitlab_client.url,
-                                    self.project_name,
-                                    self.project_owner,
-                                )
-                            )
-                        elif file["type"] == "tree":
-                            queue.append(file["path"])
-
-                    if code_doc_batch:
-                        yield code_doc_batch
+            yield from self._sync_code_files(project, incremental=start is not None)
 
         if self.include_mrs:
-            merge_requests = project.mergerequests.list(
-                state=self.state_filter, order_by="updated_at", sort="desc"
-            )
-
+            merge_requests = self._list_updated(project.mergerequests, start, end)
             for mr_batch in _batch_gitlab_objects(merge_requests, self.batch_size):
-                mr_doc_batch: list[Document] = []
-                for mr in mr_batch:
-                    mr.updated_at = datetime.strptime(
-                        mr.updated_at, "%Y-%m-%dT%H:%M:%S.%f%z"
-                    )
-                    if start is not None and mr.updated_at < start.replace(
-                        tzinfo=pytz.UTC
-                    ):
-                        yield mr_doc_batch
-                        return
-                    if end is not None and mr.updated_at > end.replace(tzinfo=pytz.UTC):
-                        continue
-                    mr_doc_batch.append(_convert_merge_request_to_document(mr))
-                yield mr_doc_batch
+                yield [_convert_merge_request_to_document(mr) for mr in mr_batch]
 
         if self.include_issues:
-            issues = project.issues.list(state=self.state_filter)
-
+            issues = self._list_updated(project.issues, start, end)
             for issue_batch in _batch_gitlab_objects(issues, self.batch_size):
-                issue_doc_batch: list[Document] = []
-                for issue in issue_batch:
-                    issue.updated_at = datetime.strptime(
-                        issue.updated_at, "%Y-%m-%dT%H:%M:%S.%f%z"
-                    )
-                    if start is not None:
-                        start = start.replace(tzinfo=pytz.UTC)
-                        if issue.updated_at < start:
-                            yield issue_doc_batch
-                            return
-                    if end is not None:
-                        end = end.replace(tzinfo=pytz.UTC)
-                        if issue.updated_at > end:
-                            continue
-                    issue_doc_batch.append(_convert_issue_to_document(issue))
-                yield issue_doc_batch
+                yield [_convert_issue_to_document(issue) for issue in issue_batch]
 
     def load_from_state(self) -> GenerateDocumentsOutput:
         return self._fetch_from_gitlab()
@@ -229,8 +655,8 @@ class GitlabConnector(LoadConnector, PollConnector):
     def poll_source(
         self, start: SecondsSinceUnixEpoch, end: SecondsSinceUnixEpoch
     ) -> GenerateDocumentsOutput:
-        start_datetime = datetime.utcfromtimestamp(start)
-        end_datetime = datetime.utcfromtimestamp(end)
+        start_datetime = datetime.fromtimestamp(start, tz=timezone.utc)
+        end_datetime = datetime.fromtimestamp(end, tz=timezone.utc)
         return self._fetch_from_gitlab(start_datetime, end_datetime)
 
 
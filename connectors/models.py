@@ -134,6 +134,9 @@ class DocumentBase(BaseModel):
 class Document(DocumentBase):
     id: str  # This must be unique or during indexing/reindexing, chunks will be overwritten
     source: DocumentSource
+    # Set on documents without sections that only signal the source document
+    # was deleted, so that its chunks are removed from the index
+    deleted: bool = False
 
     def to_short_descriptor(self) -> str:
         """Used when logging the identity of a document"""
@@ -0,0 +1,42 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any
+
+from configs.app_configs import CONNECTOR_STATE_DIR
+
+
+class ConnectorStateStore:
+    """JSON values persisted between connector runs, one file per key so that
+    connectors running concurrently never overwrite each other's state.
+    Writes are atomic: a crash leaves either the previous or the new value."""
+
+    def __init__(self, directory: str = CONNECTOR_STATE_DIR) -> None:
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(
+            self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json"
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)["value"]
+        except FileNotFoundError:
+            return default
+
+    def set(self, key: str, value: Any) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "value": value}, f)
+        os.replace(tmp_path, path)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
@@ -1,13 +1,28 @@
 import argparse
+import json
 import os
 import sys
+import time
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 from streamlit.web import cli as stcli
-from utils.process import process
+
+# Make the repository root importable so the shared `configs` and `utils`
+# packages resolve alongside `src/utils`
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Load environment variables from a .env file (containing OPENAI_API_KEY)
+# before the configs are read on import
 load_dotenv()
 
+from connectors.gitlab.connector import GitlabConnector
+from utils.connector_indexing import index_documents
+from utils.embeddings import get_embeddings
+from utils.index_profile import INDEX_PROFILES, QUANTIZATIONS, IndexProfile
+from utils.process import process
+from utils.qdrant_clients import close_qdrant_client, get_qdrant_client
+from utils.scheduler import PollJob, PollScheduler
+
 def extract_repo_name(repo_url):
     """Extract the repository name from the given repository URL."""
     repo_name = repo_url.split("/")[-1].replace(".git", "")
@@ -23,13 +38,100 @@ def process_repo(args):
     if not args.qdrant_collection_name:
         args.qdrant_collection_name = repo_name
 
+    index_profile = None
+    overrides = dict(
+        m=args.hnsw_m,
+        ef_construct=args.hnsw_ef_construct,
+        quantization=args.quantization,
+        on_disk=args.on_disk,
+    )
+    if args.index_profile:
+        index_profile = INDEX_PROFILES[args.index_profile].with_overrides(**overrides)
+    elif any(value is not None for value in overrides.values()):
+        # Without a profile, an existing collection keeps its other settings
+        index_profile = IndexProfile.from_overrides(**overrides)
+
     process(
         args.repo_url,
         args.include_file_extensions,
         args.qdrant_collection_name,
         args.repo_destination,
+        full_reload=args.full_reload,
+        workers=args.workers,
+        index_profile=index_profile,
+        summary_path=args.summary_file,
+    )
+
+def gitlab_run_key(gitlab_url, project_owner, project_name):
+    """Return the key naming a GitLab project in checkpoints and watermarks."""
+    return f"gitlab:{urlparse(gitlab_url).netloc}/{project_owner}/{project_name}"
+
+def index_gitlab(args):
+    """
+    Index the code, merge requests and issues of a GitLab project into a
+    Qdrant collection, all of them or those updated since `--since`.
+    """
+    if not args.qdrant_collection_name:
+        args.qdrant_collection_name = args.project_name.split("/")[-1]
+
+    connector = GitlabConnector(args.project_owner, args.project_name)
+    connector.load_credentials(
+        {
+            "gitlab_url": os.environ["GITLAB_URL"],
+            "gitlab_access_token": os.environ["GITLAB_ACCESS_TOKEN"],
+        }
+    )
+    if args.since is None:
+        document_batches = connector.load_from_state()
+    else:
+        document_batches = connector.poll_source(args.since, time.time())
+
+    index_documents(
+        document_batches,
+        args.qdrant_collection_name,
+        gitlab_run_key(os.environ["GITLAB_URL"], args.project_owner, args.project_name),
+        summary_path=args.summary_file,
     )
 
+def schedule(args):
+    """
+    Keep the GitLab projects listed in the `--projects` JSON file fresh,
+    polling them concurrently until interrupted. Each entry has a
+    `project_owner` and `project_name`, and optionally a `gitlab_url`
+    (GITLAB_URL by default), a `branch` and a `collection` (the project
+    name by default).
+    """
+    with open(args.projects, "r", encoding="utf-8") as f:
+        projects = json.load(f)
+
+    jobs = []
+    for project in projects:
+        gitlab_url = project.get("gitlab_url") or os.environ["GITLAB_URL"]
+        connector = GitlabConnector(
+            project["project_owner"], project["project_name"], branch=project.get("branch")
+        )
+        connector.load_credentials(
+            {"gitlab_url": gitlab_url, "gitlab_access_token": os.environ["GITLAB_ACCESS_TOKEN"]}
+        )
+        jobs.append(
+            PollJob(
+                gitlab_run_key(gitlab_url, project["project_owner"], project["project_name"]),
+                connector,
+                project.get("collection") or project["project_name"].split("/")[-1],
+                urlparse(gitlab_url).netloc,
+            )
+        )
+
+    # Every poll shares the embeddings, with their cache, and the Qdrant client
+    qdrant_client = get_qdrant_client(timeout=60)
+    scheduler = PollScheduler(jobs, embeddings=get_embeddings(), qdrant_client=qdrant_client)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+    finally:
+        close_qdrant_client(qdrant_client)
+
 def chat(args):
     """
     Start the Streamlit chat application using the specified Qdrant collection.
@@ -74,8 +176,114 @@ def main():
         default=".",
         help="The local path to clone the repository into. Defaults to current directory.",
     )
+    process_parser.add_argument(
+        "--full-reload",
+        action="store_true",
+        help=(
+            "Drop and rebuild the Qdrant collection instead of only indexing"
+            " files that changed since the previous run."
+        ),
+    )
+    process_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of processes used to load and split files. Defaults to 1."
+        ),
+    )
+    process_parser.add_argument(
+        "--index-profile",
+        choices=sorted(INDEX_PROFILES),
+        help=(
+            "How the Qdrant collection stores and indexes vectors: default,"
+            " high-recall (denser HNSW graph), low-memory (int8 quantization,"
+            " vectors and payload on disk) or binary (binary quantization,"
+            " vectors and payload on disk). Applied to an existing collection"
+            " too when given."
+        ),
+    )
+    process_parser.add_argument(
+        "--hnsw-m", type=int, help="HNSW edges per node, overriding the index profile."
+    )
+    process_parser.add_argument(
+        "--hnsw-ef-construct",
+        type=int,
+        help="HNSW candidates considered while building the graph, overriding the index profile.",
+    )
+    process_parser.add_argument(
+        "--quantization",
+        choices=QUANTIZATIONS,
+        help="Vector quantization, overriding the index profile.",
+    )
+    process_parser.add_argument(
+        "--on-disk",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Keep the original vectors and the payload on disk, overriding the index profile.",
+    )
+    process_parser.add_argument(
+        "--summary-file",
+        help=(
+            "Write the JSON summary of the run (counters, throughput and stage"
+            " times) to this path. Defaults to .chat2code/runs/<collection>/<attempt id>.json."
+        ),
+    )
     process_parser.set_defaults(func=process_repo)
 
+    # GitLab subcommand
+    gitlab_parser = subparsers.add_parser(
+        "index-gitlab", help="Index a GitLab project through its API"
+    )
+    gitlab_parser.add_argument(
+        "--project-owner",
+        default=os.environ.get("PROJECT_OWNER"),
+        required=not os.environ.get("PROJECT_OWNER"),
+        help="The group or user owning the project. Defaults to PROJECT_OWNER.",
+    )
+    gitlab_parser.add_argument(
+        "--project-name",
+        default=os.environ.get("PROJECT_NAME"),
+        required=not os.environ.get("PROJECT_NAME"),
+        help="The project path under the owner. Defaults to PROJECT_NAME.",
+    )
+    gitlab_parser.add_argument(
+        "--qdrant_collection_name",
+        help="The name for the Qdrant collection. Defaults to the project name.",
+    )
+    gitlab_parser.add_argument(
+        "--since",
+        type=float,
+        help=(
+            "Only index what changed since this Unix time: code pushed since"
+            " the last indexed commit, and merge requests and issues updated"
+            " since then. Indexes everything by default."
+        ),
+    )
+    gitlab_parser.add_argument(
+        "--summary-file",
+        help=(
+            "Write the JSON summary of the run to this path. Defaults to"
+            " .chat2code/runs/<collection>/<attempt id>.json."
+        ),
+    )
+    gitlab_parser.set_defaults(func=index_gitlab)
+
+    # Schedule subcommand
+    schedule_parser = subparsers.add_parser(
+        "schedule", help="Keep many GitLab projects indexed by polling them"
+    )
+    schedule_parser.add_argument(
+        "--projects",
+        required=True,
+        help=(
+            "JSON file listing the projects, e.g."
+            ' [{"project_owner": "my-group", "project_name": "backend/my-service"}].'
+            " Entries can also set gitlab_url, branch and collection."
+        ),
+    )
+    schedule_parser.set_defaults(func=schedule)
+
     # Chat subcommand
     chat_parser = subparsers.add_parser("chat", help="Start the chat application")
     chat_parser.add_argument(
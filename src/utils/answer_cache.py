@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from configs.app_configs import ANSWER_CACHE_MAX_ENTRIES
+from configs.app_configs import ANSWER_CACHE_SIMILARITY
+from configs.app_configs import ANSWER_CACHE_TTL_SECONDS
+from utils.manifest import read_index_version
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of answers per collection, looked up by the cosine
+    similarity of the question embedding among the answers stored under the
+    same `scope`, which names what else shaped the answer besides the question
+    and the collection, such as the system prompt. Entries expire after `ttl_seconds`,
+    the least recently used are evicted beyond `max_entries` per collection,
+    and a collection's entries are dropped once its index version, bumped by
+    every ingestion run that changes the collection, differs from theirs.
+    """
+
+    def __init__(
+        self,
+        similarity=ANSWER_CACHE_SIMILARITY,
+        ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ):
+        self.similarity = similarity
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # collection -> (index version, OrderedDict of id -> (expires_at, scope, vector, answer))
+        self._collections = {}
+        self._next_id = 0
+
+    def _entries(self, collection_name):
+        """Return the live entries of a collection, dropping them if it was re-indexed."""
+        version = read_index_version(collection_name)
+        cached = self._collections.get(collection_name)
+        if cached is None or cached[0] != version:
+            cached = (version, OrderedDict())
+            self._collections[collection_name] = cached
+        return cached[1]
+
+    def lookup(self, collection_name, vector, scope=""):
+        """Return the cached answer to the most similar question in `scope`, or None."""
+        query = _normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries(collection_name)
+            for entry_id in [i for i, (expires_at, _, _, _) in entries.items() if expires_at <= now]:
+                del entries[entry_id]
+
+            best_id = None
+            ids = [i for i, entry in entries.items() if entry[1] == scope]
+            if ids:
+                scores = np.stack([entries[i][2] for i in ids]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity:
+                    best_id = ids[best]
+
+            if best_id is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(best_id)
+            self.hits += 1
+            return entries[best_id][3]
+
+    def store(self, collection_name, vector, answer, scope=""):
+        with self._lock:
+            entries = self._entries(collection_name)
+            self._next_id += 1
+            entries[self._next_id] = (
+                time.monotonic() + self.ttl_seconds,
+                scope,
+                _normalize(vector),
+                answer,
+            )
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -2,22 +2,111 @@
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+import asyncio
+import functools
+import hmac
 import os
+import sys
 import time
+import uuid
+
+# Make `src` and the repository root importable when run as a script
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [_SRC_DIR, os.path.dirname(_SRC_DIR)]
+
+from contextlib import asynccontextmanager
+import httpx
 from langchain_qdrant import Qdrant
-from langchain.embeddings.openai import OpenAIEmbeddings
 from langchain.chains import RetrievalQA
-from langchain.chat_models import ChatOpenAI
+from langchain_openai import ChatOpenAI
 import openai
-from qdrant_client import QdrantClient
-import asyncio
 import json
 from dotenv import load_dotenv
 load_dotenv()
 
-app = FastAPI()
+from configs.app_configs import ANSWER_CACHE_ENABLED
+from configs.app_configs import API_ADMIN_TOKEN
+from configs.app_configs import API_HTTP_MAX_CONNECTIONS
+from configs.app_configs import API_HTTP_MAX_KEEPALIVE_CONNECTIONS
+from configs.app_configs import API_HTTP_TIMEOUT
+from configs.app_configs import HISTORY_CONDENSE_QUESTION
+from configs.app_configs import INDEX_STATE_DIR
+from configs.app_configs import QDRANT_USE_ASYNC_CLIENT
+from utils.answer_cache import SemanticAnswerCache
+from utils.collection_pool import CollectionHandle, CollectionPool
+from utils.embeddings import get_embeddings
+from utils.index_profile import search_params
+from utils.history import condense_question, format_turn, split_conversation
+from utils.manifest import hash_bytes
+from utils.metrics import REQUESTS, REQUEST_ERRORS, REQUESTS_IN_FLIGHT, RequestTimer, render_metrics
+from utils.process import process
+from utils.qdrant_clients import close_qdrant_client, get_async_qdrant_client, get_qdrant_client
+from utils.singleflight import StreamCoalescer
+from utils.symbols import find_identifiers, lookup_symbols
+from utils.tokens import count_tokens
+
+CHAT_MODEL = "gpt-4o"
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Create the embeddings, Qdrant clients and chat model once per process so
+    that requests share their HTTP connection pools, and the pool of
+    per-collection vector stores and QA chains.
+    """
+    limits = httpx.Limits(
+        max_connections=API_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=API_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    )
+    http_client = httpx.Client(limits=limits, timeout=API_HTTP_TIMEOUT)
+    http_async_client = httpx.AsyncClient(limits=limits, timeout=API_HTTP_TIMEOUT)
+
+    # Collection used when a request does not name one
+    default_collection_name = os.getenv("QDRANT_COLLECTION_NAME", "your-collection-name")
+
+    embeddings = get_embeddings(http_client=http_client, http_async_client=http_async_client)
+    client = get_qdrant_client(limits=limits, timeout=int(API_HTTP_TIMEOUT))
+    async_client = None
+    if QDRANT_USE_ASYNC_CLIENT:
+        async_client = get_async_qdrant_client(limits=limits, timeout=int(API_HTTP_TIMEOUT))
+    model = ChatOpenAI(
+        model=CHAT_MODEL,
+        streaming=True,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+    def create_handle(collection_name):
+        db = Qdrant(
+            client=client,
+            async_client=async_client,
+            collection_name=collection_name,
+            embeddings=embeddings,
+        )
+        retriever = db.as_retriever()
+        retriever.search_kwargs["k"] = 10
+        retriever.search_kwargs["search_params"] = search_params()
+        return CollectionHandle(collection_name, db, RetrievalQA.from_llm(model, retriever=retriever))
+
+    app.state.collections = CollectionPool(client, create_handle)
+    app.state.default_collection_name = default_collection_name
+    app.state.llm = model
+    app.state.embeddings = embeddings
+    app.state.answer_cache = SemanticAnswerCache() if ANSWER_CACHE_ENABLED else None
+    app.state.coalescer = StreamCoalescer()
+    app.state.ingestion_lock = asyncio.Lock()
+
+    yield
+
+    close_qdrant_client(client)
+    if async_client is not None:
+        await async_client.close()
+    http_client.close()
+    await http_async_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Load environment variables
 openai.api_key = os.environ.get("OPENAI_API_KEY")
@@ -49,64 +138,266 @@ class ChatRequest(BaseModel):
     temperature: float = 1.0
     max_tokens: int = 1000
 
-async def generate_streaming_response(db, messages):
-    retriever = db.as_retriever()
-    retriever.search_kwargs["k"] = 10
-    model = ChatOpenAI(model="gpt-4o")
-    qa = RetrievalQA.from_llm(model, retriever=retriever)
-
-    # Extract the last user message and use previous messages as context
-    last_user_message = None
-    context = ""
-    for message in messages:
-        if message.role == "user":
-            last_user_message = message.content
-        context += f"{message.role}: {message.content}\n"
-
-    if last_user_message is None:
+class ProcessRequest(BaseModel):
+    repo_url: str
+    qdrant_collection_name: str
+    include_file_extensions: list[str] | None = None
+    full_reload: bool = False
+    workers: int = 1
+
+def build_prompt(messages):
+    """
+    Build the QA prompt from the request messages, using the most recent earlier
+    turns that fit in the history token budget as context.
+    Returns `(prompt, history, question)`.
+    """
+    history, question = split_conversation(messages)
+    if question is None:
         raise HTTPException(status_code=400, detail="No user message found in the request")
 
+    context = "".join(format_turn(message) for message in history)
     # Add a prompt to instruct the model to respond in Chinese
-    prompt = f"{context}\n助手，请用中文回答以下问题：\n{last_user_message}"
-
-    # Execute the query and start streaming results
-    print(prompt)
-    result = qa.invoke(prompt)
-    
-    # Simulate streaming response
-    for chunk in result['result']:
-        data = {
-            "choices": [
-                {
-                    "delta": {"role": "assistant", "content": chunk},
-                    "finish_reason": None,
-                    "index": 0
-                }
-            ],
-            "created": int(time.time()),
-            "id": "chatcmpl-123",
-            "model": "gpt-4o",
-            "object": "chat.completion.chunk"
-        }
-        yield f"data: {json.dumps(data)}\n\n"
-        await asyncio.sleep(0.1)  # Simulate delay between chunks
+    return f"{context}\n助手，请用中文回答以下问题：\n{question}", history, question
 
-@app.post("/v1/chat/completions")
-async def chat(request: ChatRequest):
+def completion_chunk(completion_id, created, delta, finish_reason=None):
+    """Format one OpenAI `chat.completion.chunk` server-sent event."""
+    data = {
+        "choices": [
+            {
+                "delta": delta,
+                "finish_reason": finish_reason,
+                "index": 0
+            }
+        ],
+        "created": created,
+        "id": completion_id,
+        "model": CHAT_MODEL,
+        "object": "chat.completion.chunk"
+    }
+    return f"data: {json.dumps(data)}\n\n"
+
+async def retrieve_documents(handle, question, search_query, timer, vector=None):
+    """
+    Return the documents to answer `question` with. Identifiers in the question
+    are looked up in the symbol index first, the vector search on `search_query`
+    is only used when none of them is defined in the collection. `vector` is
+    the embedding of `search_query` when it is already known.
+    """
+    identifiers = find_identifiers(question)
+    if identifiers:
+        with timer.stage("symbol_lookup"):
+            docs = await asyncio.to_thread(lookup_symbols, handle.db, identifiers)
+        if docs:
+            return docs
+    if vector is None:
+        with timer.stage("embed_query"):
+            vector = await handle.db.embeddings.aembed_query(search_query)
+    with timer.stage("vector_search"):
+        return await handle.db.asimilarity_search_by_vector(vector, **handle.qa.retriever.search_kwargs)
+
+async def generate_answer(state, handle, prompt, history, question, cache_question=None, cache_scope=""):
+    """
+    Yield the answer to `question` from the collection of `handle` as the model
+    generates it, or at once from the answer cache when `cache_question` is
+    given, among the answers cached under `cache_scope`. Identical concurrent
+    requests share one run of this.
+    """
+    timer = RequestTimer(handle.name)
+    vector = None
+    if state.answer_cache is not None and cache_question is not None:
+        with timer.stage("embed_query"):
+            vector = await state.embeddings.aembed_query(cache_question)
+        answer = state.answer_cache.lookup(handle.name, vector, cache_scope)
+        if answer is not None:
+            timer.stages["answer_cache"] = "hit"
+            timer.log()
+            yield answer
+            return
+
+    # Only the latest question is embedded for retrieval, not the whole conversation
+    search_query = question
+    if HISTORY_CONDENSE_QUESTION:
+        with timer.stage("condense_question"):
+            search_query = await condense_question(state.llm, history, question)
+    docs = await retrieve_documents(
+        handle, question, search_query, timer, vector if search_query == cache_question else None
+    )
+
+    # Execute the query and stream the model tokens as they are generated
+    answer = []
+    usage = None
+    inputs = {"input_documents": docs, "question": prompt}
+    llm_started = time.perf_counter()
+    with timer.stage("llm_total"):
+        async for event in handle.qa.combine_documents_chain.astream_events(inputs, version="v2"):
+            if event["event"] == "on_chat_model_end":
+                usage = getattr(event["data"].get("output"), "usage_metadata", None)
+                continue
+            if event["event"] != "on_chat_model_stream":
+                continue
+            content = event["data"]["chunk"].content
+            if content:
+                if not answer:
+                    timer.observe("llm_first_token", time.perf_counter() - llm_started)
+                answer.append(content)
+                yield content
+
+    # Prefer the usage reported by the model, estimate it when streaming did not include it
+    if usage:
+        timer.count_tokens(usage["input_tokens"], usage["output_tokens"])
+    else:
+        tokens_in = count_tokens(prompt) + sum(count_tokens(doc.page_content) for doc in docs)
+        timer.count_tokens(tokens_in, count_tokens("".join(answer)))
+    timer.log()
+
+    if vector is not None:
+        state.answer_cache.store(handle.name, vector, "".join(answer), cache_scope)
+
+async def generate_streaming_response(pieces, collection_name, started):
+    """
+    Stream the answer pieces as OpenAI `chat.completion.chunk` events, timing
+    the first answer byte and the whole request from `started`.
+    """
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    timer = RequestTimer(collection_name, started)
+
+    REQUESTS_IN_FLIGHT.labels(collection_name).inc()
     try:
-        if not request.messages:
-            raise HTTPException(status_code=400, detail="Messages list is empty")
+        yield completion_chunk(completion_id, created, {"role": "assistant", "content": ""})
+        first = True
+        async for content in pieces:
+            yield completion_chunk(completion_id, created, {"content": content})
+            if first:
+                timer.since_start("sse_first_byte")
+                first = False
+        yield completion_chunk(completion_id, created, {}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+        timer.since_start("request_total")
+    except Exception:
+        REQUEST_ERRORS.labels(collection_name).inc()
+        raise
+    finally:
+        REQUESTS_IN_FLIGHT.labels(collection_name).dec()
+
+def cacheable_question(messages):
+    """
+    Return the question of a conversation whose answer can be shared through
+    the answer cache, i.e. the user message when there are no earlier turns.
+    """
+    if any(message.role == "assistant" for message in messages):
+        return None
+    questions = [message.content for message in messages if message.role == "user"]
+    return questions[0] if len(questions) == 1 else None
 
-        # Assuming the collection name is provided in the environment or hardcoded
-        qdrant_collection_name = os.getenv("QDRANT_COLLECTION_NAME", "your-collection-name")
+def answer_cache_scope(messages):
+    """
+    Key the system messages of a conversation, which build_prompt() passes to
+    the model, so that answers are only shared between identical system prompts.
+    """
+    system = [message.content for message in messages if message.role == "system"]
+    return hash_bytes(json.dumps(system, ensure_ascii=False).encode("utf-8")) if system else ""
 
-        embeddings = OpenAIEmbeddings()
-        client = QdrantClient(url=os.environ.get("QDRANT_URL"), api_key=os.environ.get("QDRANT_API_KEY"))
-        db = Qdrant(client=client, collection_name=qdrant_collection_name, embeddings=embeddings)
+def coalescing_key(collection_name, messages):
+    """Key identical conversations by collection and whitespace-normalized messages."""
+    return (
+        collection_name,
+        tuple((message.role, " ".join(message.content.split())) for message in messages),
+    )
+
+async def resolve_collection(state, request, http_request):
+    """
+    Pick the collection a request is about: the `X-Collection` header, else the
+    request `model` when it names a collection, else the default collection.
+    """
+    collection_names = await asyncio.to_thread(state.collections.list_collections)
+    header = http_request.headers.get("x-collection")
+    if header:
+        if header not in collection_names:
+            raise HTTPException(status_code=404, detail=f"Unknown collection: {header}")
+        return header
+    if request.model in collection_names:
+        return request.model
+    return state.default_collection_name
+
+@app.get("/v1/models")
+async def list_models(http_request: Request):
+    """List the collections that can be chatted with, as OpenAI models."""
+    collection_names = await asyncio.to_thread(http_request.app.state.collections.list_collections)
+    return {
+        "object": "list",
+        "data": [
+            {"id": name, "object": "model", "created": 0, "owned_by": "chat2code"}
+            for name in collection_names
+        ],
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Expose the request, stage latency, token and error metrics to Prometheus."""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+@app.post("/admin/process")
+async def process_repository(request: ProcessRequest, http_request: Request):
+    """
+    Index a git repository like the `process` CLI command, but inside the
+    server, so that it can write to the embedded Qdrant storage the server
+    holds open. The repository is cloned under the index state directory.
+    Requires the `API_ADMIN_TOKEN` bearer token, and runs one at a time.
+    """
+    if not API_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    authorization = http_request.headers.get("authorization", "")
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {API_ADMIN_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    collection_name = request.qdrant_collection_name
+    if not collection_name or os.path.basename(collection_name) != collection_name or collection_name in (".", ".."):
+        raise HTTPException(status_code=400, detail=f"Invalid collection name: {collection_name}")
+
+    state = http_request.app.state
+    if state.ingestion_lock.locked():
+        raise HTTPException(status_code=409, detail="Another repository is being processed")
+    async with state.ingestion_lock:
+        stats = await asyncio.to_thread(
+            process,
+            request.repo_url,
+            request.include_file_extensions,
+            collection_name,
+            os.path.join(INDEX_STATE_DIR, "repos", collection_name),
+            full_reload=request.full_reload,
+            workers=request.workers,
+            embeddings=state.embeddings,
+        )
+    state.collections.refresh()
+    return {"collection": collection_name, "stats": stats}
+
+@app.post("/v1/chat/completions")
+async def chat(request: ChatRequest, http_request: Request):
+    started = time.perf_counter()
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="Messages list is empty")
+    prompt, history, question = build_prompt(request.messages)
 
-        return StreamingResponse(generate_streaming_response(db, request.messages), media_type="text/event-stream")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    state = http_request.app.state
+    handle = state.collections.get(await resolve_collection(state, request, http_request))
+    REQUESTS.labels(handle.name).inc()
+    pieces = state.coalescer.subscribe(
+        coalescing_key(handle.name, request.messages),
+        functools.partial(
+            generate_answer,
+            state,
+            handle,
+            prompt,
+            history,
+            question,
+            cacheable_question(request.messages),
+            answer_cache_scope(request.messages),
+        ),
+    )
+    return StreamingResponse(
+        generate_streaming_response(pieces, handle.name, started), media_type="text/event-stream"
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,14 +1,21 @@
 import argparse
 import os
+import sys
 import json
+
+# Make `src` and the repository root importable when run as a script
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [_SRC_DIR, os.path.dirname(_SRC_DIR)]
+
 from langchain_qdrant import Qdrant
-from langchain.embeddings.openai import OpenAIEmbeddings
 from langchain.chains import RetrievalQA
 from langchain.chat_models import ChatOpenAI
 import openai
 import streamlit as st
 from streamlit_chat import message
-from qdrant_client import QdrantClient
+from utils.embeddings import get_embeddings
+from utils.index_profile import search_params
+from utils.qdrant_clients import get_qdrant_client
 
 def run_chat_app(qdrant_collection_name):
     """Run the chat application using the Streamlit framework."""
@@ -16,10 +23,10 @@ def run_chat_app(qdrant_collection_name):
 
     openai.api_key = os.environ.get("OPENAI_API_KEY")
 
-    embeddings = OpenAIEmbeddings()
+    embeddings = get_embeddings()
 
     try:
-        client = QdrantClient(url=os.environ.get("QDRANT_URL"), api_key=os.environ.get("QDRANT_API_KEY"))
+        client = get_qdrant_client()
         db = Qdrant(client=client, collection_name=qdrant_collection_name, embeddings=embeddings)
 
         if "generated" not in st.session_state:
@@ -56,6 +63,7 @@ def search_db(db, query):
     """Search for a response to the query in the Qdrant database."""
     retriever = db.as_retriever()
     retriever.search_kwargs["k"] = 10
+    retriever.search_kwargs["search_params"] = search_params()
     model = ChatOpenAI(model="gpt-3.5-turbo")
     qa = RetrievalQA.from_llm(model, retriever=retriever)
     return qa.invoke(query)
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import threading
+import time
+
+from configs.app_configs import INDEX_STATE_DIR
+
+# SQLite limits the number of bound parameters per statement
+_SQLITE_BATCH = 500
+
+
+def default_checkpoint_path(collection_name):
+    """Return the checkpoint location for connector runs indexing into a collection."""
+    return os.path.join(INDEX_STATE_DIR, "checkpoints", f"{collection_name}.sqlite")
+
+
+class IndexCheckpoint:
+    """
+    Progress of connector indexing runs that have not finished yet, keyed by a
+    run key naming the connector. For each unfinished run it records the index
+    attempt ID and the ID and content hash of every document already stored,
+    so that a run interrupted by a crash resumes under the same attempt ID and
+    skips what was stored before. Each batch is committed in one transaction.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_key TEXT PRIMARY KEY,
+                attempt_id INTEGER NOT NULL,
+                documents INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                run_key TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                PRIMARY KEY (run_key, document_id)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def start(self, run_key, attempt_id):
+        """
+        Start a run, or resume the unfinished one of `run_key`. Returns the
+        attempt ID of the run and the number of documents already stored.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempt_id, documents FROM runs WHERE run_key = ?", (run_key,)
+            ).fetchone()
+            if row is not None:
+                return row
+            self._conn.execute(
+                "INSERT INTO runs (run_key, attempt_id, updated_at) VALUES (?, ?, ?)",
+                (run_key, attempt_id, time.time()),
+            )
+            self._conn.commit()
+        return attempt_id, 0
+
+    def stored_hashes(self, run_key, document_ids):
+        """Return the content hash recorded for each of `document_ids` that was stored."""
+        document_ids = list(set(document_ids))
+        found = {}
+        with self._lock:
+            for i in range(0, len(document_ids), _SQLITE_BATCH):
+                batch = document_ids[i : i + _SQLITE_BATCH]
+                rows = self._conn.execute(
+                    "SELECT document_id, content_hash FROM documents WHERE run_key = ? AND document_id IN"
+                    f" ({','.join('?' * len(batch))})",
+                    [run_key, *batch],
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def record(self, run_key, hashes):
+        """Record that the documents of `hashes`, a `{document_id: content_hash}` dict, are stored."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (run_key, document_id, content_hash) VALUES (?, ?, ?)",
+                [(run_key, document_id, content_hash) for document_id, content_hash in hashes.items()],
+            )
+            self._conn.execute(
+                "UPDATE runs SET documents = documents + ?, updated_at = ? WHERE run_key = ?",
+                (len(hashes), time.time(), run_key),
+            )
+            self._conn.commit()
+
+    def finish(self, run_key):
+        """Forget a run once it completed, so that the next one starts over."""
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE run_key = ?", (run_key,))
+            self._conn.execute("DELETE FROM runs WHERE run_key = ?", (run_key,))
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
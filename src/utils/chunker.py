@@ -0,0 +1,190 @@
+import ast
+import os
+
+from langchain.docstore.document import Document
+from langchain.text_splitter import Language, RecursiveCharacterTextSplitter
+
+from configs.app_configs import CHUNK_TOKENS
+from utils.tokens import count_tokens
+
+LANGUAGE_BY_EXTENSION = {
+    ".py": Language.PYTHON,
+    ".js": Language.JS,
+    ".jsx": Language.JS,
+    ".mjs": Language.JS,
+    ".cjs": Language.JS,
+    ".ts": Language.TS,
+    ".tsx": Language.TS,
+    ".java": Language.JAVA,
+    ".kt": Language.KOTLIN,
+    ".kts": Language.KOTLIN,
+    ".scala": Language.SCALA,
+    ".go": Language.GO,
+    ".rs": Language.RUST,
+    ".rb": Language.RUBY,
+    ".php": Language.PHP,
+    ".swift": Language.SWIFT,
+    ".cs": Language.CSHARP,
+    ".c": Language.C,
+    ".h": Language.C,
+    ".cc": Language.CPP,
+    ".cpp": Language.CPP,
+    ".cxx": Language.CPP,
+    ".hpp": Language.CPP,
+    ".proto": Language.PROTO,
+    ".sol": Language.SOL,
+    ".lua": Language.LUA,
+    ".pl": Language.PERL,
+    ".hs": Language.HASKELL,
+    ".ex": Language.ELIXIR,
+    ".exs": Language.ELIXIR,
+    ".ps1": Language.POWERSHELL,
+    ".md": Language.MARKDOWN,
+    ".rst": Language.RST,
+    ".tex": Language.LATEX,
+    ".html": Language.HTML,
+}
+
+
+def _node_start(node):
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [decorator.lineno for decorator in decorators])
+
+
+def _partition(nodes, start, end):
+    """
+    Cut lines `start`..`end` (1-based, inclusive) after each statement in `nodes`.
+    Comments and blank lines stay with the statement that follows them and
+    trailing lines with the last one.
+    """
+    spans = []
+    cursor = start
+    for node in nodes:
+        if node.end_lineno < cursor:
+            continue
+        spans.append([cursor, node.end_lineno, node])
+        cursor = node.end_lineno + 1
+    if cursor <= end:
+        if spans:
+            spans[-1][1] = end
+        else:
+            spans.append([cursor, end, None])
+    return spans
+
+
+def _python_spans(nodes, start, end, lines, budget):
+    """
+    Yield `(start, end, tokens)` line spans along statement boundaries. Blocks
+    over budget (classes, functions, compound statements) are broken up into
+    their header and the statements of their body.
+    """
+    for span_start, span_end, node in _partition(nodes, start, end):
+        tokens = count_tokens("".join(lines[span_start - 1 : span_end]))
+        body = getattr(node, "body", None)
+        if tokens <= budget or not isinstance(body, list) or not body:
+            yield span_start, span_end, tokens
+            continue
+
+        body_start = _node_start(body[0])
+        if body_start > span_start:
+            header = "".join(lines[span_start - 1 : body_start - 1])
+            yield span_start, body_start - 1, count_tokens(header)
+        yield from _python_spans(body, max(body_start, span_start), span_end, lines, budget)
+
+
+class CodeChunker:
+    """
+    Split source files into chunks of at most `chunk_tokens` tiktoken tokens.
+    Python is cut along the statements of its syntax tree, so functions and
+    classes are kept whole when they fit and adjacent small blocks are packed
+    together. Other languages are split recursively on their syntax separators
+    (class, function and block keywords) before falling back to lines.
+    """
+
+    def __init__(self, chunk_tokens=CHUNK_TOKENS):
+        self.chunk_tokens = chunk_tokens
+        self._splitters = {}
+
+    def _splitter(self, language):
+        if language not in self._splitters:
+            if language is None:
+                separators = ["\n\n", "\n", " ", ""]
+            else:
+                separators = RecursiveCharacterTextSplitter.get_separators_for_language(language)
+            self._splitters[language] = RecursiveCharacterTextSplitter(
+                separators=separators,
+                is_separator_regex=language is not None,
+                chunk_size=self.chunk_tokens,
+                chunk_overlap=0,
+                length_function=count_tokens,
+            )
+        return self._splitters[language]
+
+    def _split_generic(self, text, language, first_line=1):
+        chunks = []
+        line = first_line
+        cursor = 0
+        for chunk in self._splitter(language).split_text(text):
+            offset = text.find(chunk, cursor)
+            if offset >= 0:
+                line += text.count("\n", cursor, offset)
+                cursor = offset
+            chunks.append((line, chunk))
+        return chunks
+
+    def _split_python(self, text):
+        lines = text.splitlines(keepends=True)
+        tree = ast.parse(text)
+
+        chunks = []
+        current_start = None
+        current_end = None
+        current_tokens = 0
+
+        def flush():
+            if current_start is None:
+                return
+            start = current_start
+            # Drop leading blank lines, they only pad the chunk
+            while start < current_end and not lines[start - 1].strip():
+                start += 1
+            chunk = "".join(lines[start - 1 : current_end])
+            if chunk.strip():
+                chunks.append((start, chunk))
+
+        for start, end, tokens in _python_spans(tree.body, 1, len(lines), lines, self.chunk_tokens):
+            if current_start is not None and current_tokens + tokens <= self.chunk_tokens:
+                current_end = end
+                current_tokens += tokens
+                continue
+            flush()
+            if tokens > self.chunk_tokens:
+                # A single statement too large to cut along the syntax tree
+                chunk = "".join(lines[start - 1 : end])
+                chunks.extend(self._split_generic(chunk, Language.PYTHON, start))
+                current_start = None
+                current_tokens = 0
+            else:
+                current_start, current_end, current_tokens = start, end, tokens
+        flush()
+        return chunks
+
+    def split_text(self, text, file_path=""):
+        """Return `(start_line, chunk)` pairs for the content of `file_path`."""
+        language = LANGUAGE_BY_EXTENSION.get(os.path.splitext(file_path)[1].lower())
+        if language == Language.PYTHON:
+            try:
+                return self._split_python(text)
+            except (SyntaxError, ValueError, RecursionError):
+                pass
+        return self._split_generic(text, language)
+
+    def split_documents(self, docs):
+        """Split documents using the language of their `source` path."""
+        chunks = []
+        for doc in docs:
+            for start_line, text in self.split_text(doc.page_content, doc.metadata.get("source", "")):
+                chunks.append(
+                    Document(page_content=text, metadata={**doc.metadata, "start_line": start_line})
+                )
+        return chunks
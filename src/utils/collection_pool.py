@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+
+from configs.app_configs import API_COLLECTION_LIST_TTL_SECONDS
+from configs.app_configs import API_MAX_COLLECTIONS
+
+
+class CollectionHandle:
+    """The vector store and QA chain serving one Qdrant collection."""
+
+    def __init__(self, name, db, qa):
+        self.name = name
+        self.db = db
+        self.qa = qa
+
+
+class CollectionPool:
+    """
+    Bounded LRU pool of collection handles, so that one server can answer for
+    many collections while keeping the recently used ones warm. `create_handle`
+    builds the handle of a collection on first use.
+    """
+
+    def __init__(
+        self,
+        client,
+        create_handle,
+        max_size=API_MAX_COLLECTIONS,
+        list_ttl_seconds=API_COLLECTION_LIST_TTL_SECONDS,
+    ):
+        self.client = client
+        self.create_handle = create_handle
+        self.max_size = max_size
+        self.list_ttl_seconds = list_ttl_seconds
+        self._handles = OrderedDict()
+        self._names = []
+        self._names_expire_at = 0.0
+        self._lock = threading.Lock()
+
+    def list_collections(self):
+        """Return the names of the Qdrant collections, refreshed every `list_ttl_seconds`."""
+        if time.monotonic() >= self._names_expire_at:
+            names = sorted(c.name for c in self.client.get_collections().collections)
+            with self._lock:
+                self._names = names
+                self._names_expire_at = time.monotonic() + self.list_ttl_seconds
+                # Drop the handles of collections that were deleted
+                for name in [n for n in self._handles if n not in names]:
+                    del self._handles[name]
+        return self._names
+
+    def refresh(self):
+        """Refresh the list of collections on next use, e.g. after one was created."""
+        with self._lock:
+            self._names_expire_at = 0.0
+
+    def get(self, name):
+        with self._lock:
+            handle = self._handles.get(name)
+            if handle is not None:
+                self._handles.move_to_end(name)
+                return handle
+            handle = self.create_handle(name)
+            self._handles[name] = handle
+            while len(self._handles) > self.max_size:
+                self._handles.popitem(last=False)
+            return handle
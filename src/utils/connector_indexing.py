@@ -0,0 +1,265 @@
+import contextlib
+import threading
+import time
+
+from langchain.docstore.document import Document
+from langchain_qdrant import Qdrant
+from qdrant_client.http.models import (
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HasIdCondition,
+    MatchAny,
+    PayloadSchemaType,
+)
+
+from configs.app_configs import PROGRESS_LOG_INTERVAL_SECONDS
+from utils.checkpoint import IndexCheckpoint, default_checkpoint_path
+from utils.embeddings import CachedEmbeddings, embedding_dimension, get_embeddings
+from utils.index_profile import INDEX_PROFILES
+from utils.logger import IndexAttemptSingleton, setup_logger
+from utils.manifest import bump_index_version, chunk_point_ids, hash_bytes
+from utils.process import describe_error, embed_batches, split_docs, upsert_chunks
+from utils.progress import IngestionProgress, default_summary_path, new_attempt_id, write_summary
+from utils.qdrant_clients import get_qdrant_client
+from utils.symbols import SYMBOLS_FIELD
+
+logger = setup_logger()
+
+# Chunk metadata field holding the ID of the connector document the chunk comes from
+DOCUMENT_ID_FIELD = "document_id"
+
+# Runs into the same collection check and create it one at a time
+_collection_locks = {}
+_collection_locks_lock = threading.Lock()
+
+
+def _collection_lock(collection_name):
+    with _collection_locks_lock:
+        return _collection_locks.setdefault(collection_name, threading.Lock())
+
+
+def document_hash(document):
+    """Return a hash of everything indexed from a connector document."""
+    return hash_bytes(document.model_dump_json().encode("utf-8"))
+
+
+def split_document(document, attempt_id=None):
+    """
+    Split the sections of a connector document into chunks tagged with the
+    symbols they define. Each chunk carries the connector metadata of the
+    document, plus its ID, title, update time, section link as `source` and
+    the attempt that indexed it.
+    """
+    chunks = []
+    for section in document.sections:
+        doc = Document(
+            page_content=section.text,
+            metadata={
+                **document.metadata,
+                "source": section.link or document.id,
+                DOCUMENT_ID_FIELD: document.id,
+                "title": document.get_title_for_document_index() or "",
+                "doc_updated_at": document.doc_updated_at.isoformat() if document.doc_updated_at else None,
+                "index_attempt_id": attempt_id,
+            },
+        )
+        chunks.extend(split_docs([doc]))
+    return chunks
+
+
+def ensure_collection(qdrant_client, collection_name, vector_size, index_profile=None):
+    """
+    Create the collection with `index_profile` if it does not exist, or apply
+    `index_profile` to it when given. Unlike a repository, a collection fed
+    by connectors is never rebuilt implicitly, so vectors of another size are
+    an error, and concurrent runs into a new collection create it only once.
+    """
+    with _collection_lock(collection_name):
+        created = not qdrant_client.collection_exists(collection_name)
+        if created:
+            profile = index_profile or INDEX_PROFILES["default"]
+            logger.info(f"Creating collection {collection_name} with {profile}")
+            profile.create_collection(qdrant_client, collection_name, vector_size, replace=False)
+    if not created:
+        collection_size = qdrant_client.get_collection(collection_name).config.params.vectors.size
+        if collection_size != vector_size:
+            raise ValueError(
+                f"Collection {collection_name} holds vectors of size {collection_size},"
+                f" the embedding model produces {vector_size}"
+            )
+        if index_profile is not None:
+            logger.info(f"Updating collection {collection_name} to {index_profile}")
+            index_profile.update_collection(qdrant_client, collection_name)
+    for field in (SYMBOLS_FIELD, DOCUMENT_ID_FIELD):
+        qdrant_client.create_payload_index(
+            collection_name=collection_name,
+            field_name=f"metadata.{field}",
+            field_schema=PayloadSchemaType.KEYWORD,
+        )
+
+
+def delete_stale_points(db, document_ids, point_ids):
+    """
+    Delete the points of `document_ids` other than `point_ids`: the chunks
+    the new versions of the documents no longer have, and every chunk of the
+    deleted ones.
+    """
+    if not document_ids:
+        return
+    db.client.delete(
+        collection_name=db.collection_name,
+        points_selector=FilterSelector(
+            filter=Filter(
+                must=[
+                    FieldCondition(
+                        key=f"{db.metadata_payload_key}.{DOCUMENT_ID_FIELD}",
+                        match=MatchAny(any=list(document_ids)),
+                    )
+                ],
+                must_not=[HasIdCondition(has_id=list(point_ids))] if point_ids else None,
+            )
+        ),
+    )
+
+
+def prepare_batch(documents, checkpoint, run_key, attempt_id, stats):
+    """
+    Split the documents of a batch that were not stored yet by this run,
+    returning `(chunks, hashes)`: the `(point_id, chunk)` pairs to store and
+    the content hash of each document to record in the checkpoint.
+    """
+    stored = checkpoint.stored_hashes(run_key, [document.id for document in documents])
+    chunks = []
+    hashes = {}
+    for document in documents:
+        content_hash = document_hash(document)
+        if stored.get(document.id) == content_hash:
+            stats["documents_skipped"] += 1
+            continue
+        hashes[document.id] = content_hash
+        if document.deleted:
+            stats["documents_deleted"] += 1
+            continue
+        texts = split_document(document, attempt_id)
+        point_ids = chunk_point_ids(document.id, [text.page_content for text in texts])
+        chunks.extend(zip(point_ids, texts))
+        stats["documents_indexed"] += 1
+    return chunks, hashes
+
+
+def index_documents(
+    document_batches,
+    collection_name,
+    run_key,
+    embeddings=None,
+    index_profile=None,
+    checkpoint=None,
+    summary_path=None,
+    qdrant_client=None,
+    write_lock=None,
+):
+    """
+    Index the document batches of a connector, from `load_from_state` or
+    `poll_source`, into a Qdrant collection, creating it with `index_profile`
+    if needed. The sections of each document are chunked and embedded, and
+    stored under point IDs derived from the document ID and chunk content, so
+    re-indexing a document overwrites its chunks. The chunks a document no
+    longer has are deleted, and so are all the chunks of documents yielded
+    as deleted.
+
+    Progress is checkpointed under `run_key` after every batch. When a run
+    is interrupted, the next run with the same key resumes it: it keeps the
+    index attempt ID of the interrupted run, and skips the documents that
+    were already stored unless their content changed. Batches are consumed
+    one at a time, so a connector that commits its own sync state once its
+    last batch is consumed only does so after everything was stored.
+
+    A JSON summary of the run is written to `summary_path`, by default under
+    the index state directory. `embeddings` defaults to `get_embeddings()`
+    and `qdrant_client` to `get_qdrant_client()`. When `write_lock` is given,
+    the collection is prepared and each batch is stored while holding it, so
+    that runs sharing the lock write one at a time. Returns the indexing stats.
+    """
+    checkpoint = checkpoint or IndexCheckpoint(default_checkpoint_path(collection_name))
+    attempt_id, resumed_documents = checkpoint.start(run_key, new_attempt_id())
+    previous_attempt_id = IndexAttemptSingleton.get_index_attempt_id()
+    IndexAttemptSingleton.set_index_attempt_id(attempt_id)
+    summary_path = summary_path or default_summary_path(collection_name, attempt_id)
+    progress = IngestionProgress()
+    stats = {
+        "batches": 0,
+        "documents_indexed": 0,
+        "documents_deleted": 0,
+        "documents_skipped": 0,
+        "chunks_added": 0,
+    }
+    summary = {
+        "attempt_id": attempt_id,
+        "collection": collection_name,
+        "run_key": run_key,
+        "resumed_documents": resumed_documents,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "status": "failed",
+    }
+    if resumed_documents:
+        logger.info(f"Resuming {run_key} into {collection_name}, {resumed_documents} documents already stored")
+    else:
+        logger.info(f"Indexing {run_key} into {collection_name}")
+
+    try:
+        if embeddings is None:
+            embeddings = get_embeddings()
+        write_lock = write_lock or contextlib.nullcontext()
+        with progress.stage("prepare_collection"):
+            if qdrant_client is None:
+                qdrant_client = get_qdrant_client(timeout=60)
+            vector_size = embedding_dimension(embeddings)
+            with write_lock:
+                ensure_collection(qdrant_client, collection_name, vector_size, index_profile)
+        db = Qdrant(client=qdrant_client, collection_name=collection_name, embeddings=embeddings)
+
+        def prepared_batches():
+            for documents in progress.track(document_batches, "fetch"):
+                with progress.stage("split"):
+                    yield prepare_batch(documents, checkpoint, run_key, attempt_id, stats)
+
+        last_log = time.monotonic()
+        for chunks, vectors, hashes in embed_batches(prepared_batches(), embeddings, progress):
+            with write_lock:
+                with progress.stage("upsert"):
+                    upsert_chunks(db, chunks, vectors)
+                with progress.stage("delete"):
+                    delete_stale_points(db, hashes, [point_id for point_id, _ in chunks])
+            checkpoint.record(run_key, hashes)
+            stats["batches"] += 1
+            stats["chunks_added"] += len(chunks)
+            if time.monotonic() - last_log >= PROGRESS_LOG_INTERVAL_SECONDS:
+                last_log = time.monotonic()
+                logger.info(f"Progress: {stats}")
+
+        checkpoint.finish(run_key)
+        if stats["documents_indexed"] or stats["documents_deleted"]:
+            bump_index_version(collection_name)
+
+        summary["status"] = "succeeded"
+        summary["stats"] = stats
+        logger.info(f"Indexed {run_key} into {collection_name}: {stats}")
+        if isinstance(embeddings, CachedEmbeddings):
+            summary["embedding_cache"] = embeddings.cache.stats()
+        return stats
+    except Exception as e:
+        summary["error"] = describe_error(e)
+        summary["stats"] = stats
+        raise
+    finally:
+        try:
+            summary["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+            summary["wall_seconds"] = round(time.monotonic() - progress.started, 3)
+            summary["stage_seconds"] = {stage: round(seconds, 3) for stage, seconds in progress.stage_seconds.items()}
+            progress.log_stage_times()
+            write_summary(summary_path, summary)
+            logger.info(f"Run summary written to {summary_path}")
+        finally:
+            # The thread may go on serving other work, such as API requests
+            IndexAttemptSingleton.set_index_attempt_id(previous_attempt_id)
@@ -0,0 +1,240 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from configs.app_configs import EMBEDDING_BACKEND
+from configs.app_configs import EMBEDDING_CACHE_ENABLED
+from configs.app_configs import EMBEDDING_CACHE_MAX_ENTRIES
+from configs.app_configs import EMBEDDING_CACHE_PATH
+
+# SQLite limits the number of bound parameters per statement
+_SQLITE_BATCH = 500
+
+# Output size of the OpenAI embedding models at their default dimensions
+OPENAI_EMBEDDING_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+
+def _text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _encode_vector(vector):
+    return array("f", vector).tobytes()
+
+
+def _decode_vector(blob):
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (embedding model, SHA-256 of the text).
+    Entries are evicted least-recently-used first once `max_entries` is
+    exceeded. Safe to share between threads, and between processes through
+    SQLite's own locking.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def get_many(self, model, texts):
+        """Return the cached vector for each text, or None where it is not cached."""
+        hashes = [_text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            for i in range(0, len(hashes), _SQLITE_BATCH):
+                batch = list(set(hashes[i : i + _SQLITE_BATCH]))
+                rows = self._conn.execute(
+                    "SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN"
+                    f" ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                ).fetchall()
+                found.update((text_hash, _decode_vector(blob)) for text_hash, blob in rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash in found],
+                )
+                self._conn.commit()
+
+            vectors = [found.get(text_hash) for text_hash in hashes]
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, model, texts, vectors):
+        """Store the vectors for the given texts and evict old entries if over capacity."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (model, _text_hash(text), _encode_vector(vector), now)
+                    for text, vector in zip(texts, vectors)
+                ],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if not self.max_entries:
+            return
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN"
+                " (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+
+    def stats(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": count,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Wrap an `Embeddings` implementation so that only uncached texts reach it."""
+
+    def __init__(self, embeddings, cache, model_name=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or getattr(embeddings, "model", type(embeddings).__name__)
+
+    def _lookup(self, texts):
+        """Return the cached vectors and the positions of each uncached text."""
+        vectors = self.cache.get_many(self.model_name, texts)
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(texts[i], []).append(i)
+        return vectors, missing
+
+    def _fill(self, vectors, missing, new_vectors):
+        """Store freshly computed vectors and put them in place."""
+        self.cache.put_many(self.model_name, list(missing), new_vectors)
+        for positions, vector in zip(missing.values(), new_vectors):
+            for i in positions:
+                vectors[i] = list(vector)
+        return vectors
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        vectors, missing = self._lookup(texts)
+        if not missing:
+            return vectors
+        return self._fill(vectors, missing, self.embeddings.embed_documents(list(missing)))
+
+    def embed_query(self, text):
+        (vector,) = self.cache.get_many(self.model_name, [text])
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many(self.model_name, [text], [vector])
+        return vector
+
+    async def aembed_documents(self, texts):
+        texts = list(texts)
+        vectors, missing = self._lookup(texts)
+        if not missing:
+            return vectors
+        return self._fill(vectors, missing, await self.embeddings.aembed_documents(list(missing)))
+
+    async def aembed_query(self, text):
+        (vector,) = self.cache.get_many(self.model_name, [text])
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self.cache.put_many(self.model_name, [text], [vector])
+        return vector
+
+
+_embedding_cache = None
+
+
+def get_embedding_cache():
+    """Return the process-wide embedding cache."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+
+def get_embeddings(**kwargs):
+    """
+    Return the embeddings used for both ingestion and queries, from the
+    `EMBEDDING_BACKEND` setting and cached if enabled. Keyword arguments
+    (e.g. shared HTTP clients) are passed to OpenAIEmbeddings.
+    """
+    if EMBEDDING_BACKEND == "openai":
+        embeddings = OpenAIEmbeddings(**kwargs)
+    elif EMBEDDING_BACKEND == "local":
+        from utils.local_embeddings import LocalEmbeddings
+
+        embeddings = LocalEmbeddings()
+    else:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {EMBEDDING_BACKEND!r}, expected 'openai' or 'local'")
+    if not EMBEDDING_CACHE_ENABLED:
+        return embeddings
+    return CachedEmbeddings(embeddings, get_embedding_cache())
+
+
+def embedding_dimension(embeddings):
+    """
+    Return the size of the vectors produced by `embeddings`, from the model
+    name when it is known and otherwise by embedding a probe text.
+    """
+    inner = embeddings.embeddings if isinstance(embeddings, CachedEmbeddings) else embeddings
+    dimensions = getattr(inner, "dimensions", None)
+    if dimensions:
+        return dimensions
+    model = getattr(inner, "model", None)
+    if model in OPENAI_EMBEDDING_DIMENSIONS:
+        return OPENAI_EMBEDDING_DIMENSIONS[model]
+    return len(embeddings.embed_query("dimension probe"))
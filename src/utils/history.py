@@ -0,0 +1,63 @@
+from configs.app_configs import HISTORY_TOKEN_BUDGET
+from utils.tokens import count_tokens
+
+CONDENSE_PROMPT = (
+    "Given the following conversation and a follow up question, rephrase the"
+    " follow up question to be a standalone question, in its original language.\n\n"
+    "Chat History:\n{history}\n"
+    "Follow Up Input: {question}\n"
+    "Standalone question:"
+)
+
+
+def format_turn(message):
+    return f"{message.role}: {message.content}\n"
+
+
+def split_conversation(messages, budget=HISTORY_TOKEN_BUDGET):
+    """
+    Split a conversation into its latest user message and the earlier turns
+    that fit in `budget` tokens. System messages are kept first, then the most
+    recent turns, and the kept history is returned in conversation order.
+    Returns `(history, question)`, where `question` is None without a user message.
+    """
+    last_user = None
+    for i, message in enumerate(messages):
+        if message.role == "user":
+            last_user = i
+    if last_user is None:
+        return [], None
+
+    question = messages[last_user].content
+    earlier = messages[:last_user]
+    remaining = budget - count_tokens(question)
+
+    kept = set()
+    for i, message in enumerate(earlier):
+        if message.role == "system":
+            tokens = count_tokens(format_turn(message))
+            if tokens > remaining:
+                break
+            kept.add(i)
+            remaining -= tokens
+    for i in range(len(earlier) - 1, -1, -1):
+        if i in kept:
+            continue
+        tokens = count_tokens(format_turn(earlier[i]))
+        if tokens > remaining:
+            break
+        kept.add(i)
+        remaining -= tokens
+
+    return [earlier[i] for i in sorted(kept)], question
+
+
+async def condense_question(llm, history, question):
+    """Ask `llm` to rewrite a follow-up question so that it stands on its own for retrieval."""
+    if not history:
+        return question
+    prompt = CONDENSE_PROMPT.format(
+        history="".join(format_turn(message) for message in history), question=question
+    )
+    result = await llm.ainvoke(prompt)
+    return result.content.strip() or question
@@ -0,0 +1,148 @@
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Disabled,
+    HnswConfigDiff,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+    VectorParamsDiff,
+)
+
+from configs.app_configs import QDRANT_HNSW_EF
+from configs.app_configs import QDRANT_OVERSAMPLING
+
+QUANTIZATIONS = ["none", "scalar", "binary"]
+SETTINGS = ("m", "ef_construct", "quantization", "on_disk")
+
+
+class IndexProfile:
+    """
+    How a Qdrant collection stores and indexes its vectors: the HNSW graph
+    parameters, the quantization of the vectors and whether the original
+    vectors and the payload live on disk instead of in RAM. Quantized vectors
+    are always kept in RAM, so searches only read the originals from disk to
+    rescore the best candidates.
+
+    `applied` names the settings `update_collection` changes on an existing
+    collection, all of them by default.
+    """
+
+    def __init__(self, m=16, ef_construct=100, quantization="none", on_disk=False, applied=SETTINGS):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+        self.m = m
+        self.ef_construct = ef_construct
+        self.quantization = quantization
+        self.on_disk = on_disk
+        self.applied = tuple(setting for setting in SETTINGS if setting in applied)
+
+    def with_overrides(self, m=None, ef_construct=None, quantization=None, on_disk=None):
+        """Return a copy of the profile with the given settings replaced."""
+        return IndexProfile(
+            m=self.m if m is None else m,
+            ef_construct=self.ef_construct if ef_construct is None else ef_construct,
+            quantization=self.quantization if quantization is None else quantization,
+            on_disk=self.on_disk if on_disk is None else on_disk,
+            applied=self.applied,
+        )
+
+    @classmethod
+    def from_overrides(cls, m=None, ef_construct=None, quantization=None, on_disk=None):
+        """
+        Return the default profile with the given settings replaced, which
+        changes only those settings of an existing collection.
+        """
+        overrides = dict(m=m, ef_construct=ef_construct, quantization=quantization, on_disk=on_disk)
+        applied = [setting for setting, value in overrides.items() if value is not None]
+        return IndexProfile(applied=applied).with_overrides(**overrides)
+
+    def hnsw_config(self):
+        return HnswConfigDiff(m=self.m, ef_construct=self.ef_construct, on_disk=self.on_disk)
+
+    def vectors_config(self, size):
+        return VectorParams(size=size, distance="Cosine", on_disk=self.on_disk)
+
+    def quantization_config(self):
+        if self.quantization == "scalar":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def create_collection(self, client, collection_name, size, replace=True):
+        """
+        Create `collection_name` with this profile, dropping it first if it
+        exists and `replace` is set. Without `replace`, creating a collection
+        that exists fails instead of wiping it.
+        """
+        create = client.recreate_collection if replace else client.create_collection
+        create(
+            collection_name=collection_name,
+            vectors_config=self.vectors_config(size),
+            hnsw_config=self.hnsw_config(),
+            quantization_config=self.quantization_config(),
+            on_disk_payload=self.on_disk,
+        )
+
+    def update_collection(self, client, collection_name):
+        """
+        Apply the `applied` settings of this profile to an existing collection,
+        leaving the others as they are. Qdrant rebuilds the index and the
+        quantized vectors in the background. The payload storage of a
+        collection is fixed when it is created.
+        """
+        applied = set(self.applied)
+        hnsw_config = None
+        if applied & {"m", "ef_construct", "on_disk"}:
+            hnsw_config = HnswConfigDiff(
+                m=self.m if "m" in applied else None,
+                ef_construct=self.ef_construct if "ef_construct" in applied else None,
+                on_disk=self.on_disk if "on_disk" in applied else None,
+            )
+        quantization_config = None
+        if "quantization" in applied:
+            quantization_config = self.quantization_config() or Disabled.DISABLED
+        client.update_collection(
+            collection_name=collection_name,
+            vectors_config={"": VectorParamsDiff(on_disk=self.on_disk)} if "on_disk" in applied else None,
+            hnsw_config=hnsw_config,
+            quantization_config=quantization_config,
+        )
+
+    def __repr__(self):
+        settings = ", ".join(f"{setting}={getattr(self, setting)!r}" for setting in self.applied)
+        return f"IndexProfile({settings})"
+
+
+INDEX_PROFILES = {
+    # Qdrant defaults: everything in RAM, no quantization
+    "default": IndexProfile(),
+    # Denser graph for better recall, at the cost of RAM and indexing time
+    "high-recall": IndexProfile(m=32, ef_construct=256),
+    # int8 vectors in RAM (4x smaller), originals and payload on disk
+    "low-memory": IndexProfile(quantization="scalar", on_disk=True),
+    # 1 bit per dimension in RAM (32x smaller), originals and payload on disk.
+    # Suited to large embeddings such as the 1536 dimensions of the OpenAI models.
+    "binary": IndexProfile(quantization="binary", on_disk=True),
+}
+
+
+def search_params(hnsw_ef=QDRANT_HNSW_EF, oversampling=QDRANT_OVERSAMPLING):
+    """
+    Return the Qdrant search parameters for queries, or None to use the
+    collection defaults. `hnsw_ef` widens the HNSW search for better recall;
+    with `oversampling` the quantized vectors select `oversampling` times more
+    candidates, which are then rescored with the original vectors.
+    """
+    if not hnsw_ef and not oversampling:
+        return None
+    quantization = None
+    if oversampling:
+        quantization = QuantizationSearchParams(rescore=True, oversampling=oversampling)
+    return SearchParams(hnsw_ef=hnsw_ef or None, quantization=quantization)
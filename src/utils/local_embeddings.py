@@ -0,0 +1,102 @@
+import threading
+
+from langchain_core.embeddings import Embeddings
+
+from configs.app_configs import LOCAL_EMBEDDING_BATCH_SIZE
+from configs.app_configs import LOCAL_EMBEDDING_MODEL
+from configs.app_configs import LOCAL_EMBEDDING_RUNTIME
+from configs.app_configs import LOCAL_EMBEDDING_THREADS
+
+
+class _Request:
+    def __init__(self, texts):
+        self.texts = texts
+        self.vectors = None
+        self.error = None
+        self.done = False
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Embed texts on the CPU with a sentence-transformers model, on the torch or
+    the ONNX runtime, so that indexing and queries need no network access.
+
+    Calls from concurrent threads are batched together: while the model is
+    busy, incoming texts queue up and the next thread to get the model encodes
+    everything queued in one pass. Vectors are normalized, so cosine similarity
+    matches the dot product.
+    """
+
+    def __init__(
+        self,
+        model_name=LOCAL_EMBEDDING_MODEL,
+        batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+        threads=LOCAL_EMBEDDING_THREADS,
+        runtime=LOCAL_EMBEDDING_RUNTIME,
+    ):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The local embedding backend needs sentence-transformers:"
+                " pip install sentence-transformers (and optimum[onnxruntime] for the ONNX runtime)"
+            ) from e
+
+        if threads:
+            torch.set_num_threads(threads)
+        kwargs = {"backend": "onnx"} if runtime == "onnx" else {}
+        # `model` holds the name, as for OpenAIEmbeddings, so it keys the embedding cache
+        self.model = model_name
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(model_name, device="cpu", **kwargs)
+        self._model_lock = threading.Lock()
+        self._queue_lock = threading.Lock()
+        self._queue = []
+
+    @property
+    def dimensions(self):
+        return self._model.get_sentence_embedding_dimension()
+
+    def _encode(self, texts):
+        # sentence-transformers sorts the texts by length, so batches carry little padding
+        vectors = self._model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def _embed(self, texts):
+        request = _Request(texts)
+        with self._queue_lock:
+            self._queue.append(request)
+        with self._model_lock:
+            if not request.done:
+                with self._queue_lock:
+                    batch, self._queue = self._queue, []
+                try:
+                    vectors = self._encode([text for queued in batch for text in queued.texts])
+                except Exception as e:
+                    for queued in batch:
+                        queued.error = e
+                else:
+                    offset = 0
+                    for queued in batch:
+                        queued.vectors = vectors[offset : offset + len(queued.texts)]
+                        offset += len(queued.texts)
+                for queued in batch:
+                    queued.done = True
+        if request.error is not None:
+            raise request.error
+        return request.vectors
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self._embed(list(texts))
+
+    def embed_query(self, text):
+        return self._embed([text])[0]
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import uuid
+
+from configs.app_configs import INDEX_STATE_DIR
+
+MANIFEST_VERSION = 1
+
+# Namespace for deterministic Qdrant point IDs derived from file path and chunk content
+POINT_ID_NAMESPACE = uuid.UUID("9a3c5a1e-5b1f-4f0e-8d3c-6c2f0b7e4a11")
+
+
+def hash_bytes(data):
+    """Return the hex SHA-256 digest of the given bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path):
+    """Return the hex SHA-256 digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_point_ids(rel_path, chunks):
+    """
+    Derive a stable Qdrant point ID for each chunk of a file.
+    The same text at the same path always maps to the same ID, so unchanged
+    chunks of an edited file keep their vectors.
+    """
+    ids = []
+    seen = {}
+    for chunk in chunks:
+        chunk_hash = hash_bytes(chunk.encode("utf-8"))
+        occurrence = seen.get(chunk_hash, 0)
+        seen[chunk_hash] = occurrence + 1
+        ids.append(
+            str(uuid.uuid5(POINT_ID_NAMESPACE, f"{rel_path}\0{chunk_hash}\0{occurrence}"))
+        )
+    return ids
+
+
+def default_manifest_path(collection_name):
+    """Return the manifest location for a Qdrant collection."""
+    return os.path.join(INDEX_STATE_DIR, "manifests", f"{collection_name}.json")
+
+
+class IndexManifest:
+    """
+    Record of what has been indexed into a collection: for every file path
+    relative to the repository root, its content hash and the Qdrant point IDs
+    of its chunks.
+    """
+
+    def __init__(self, path, files=None):
+        self.path = path
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, path):
+        """Load the manifest at `path`, or return an empty one if it does not exist."""
+        if not os.path.isfile(path):
+            return cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get("files", {}))
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def save(self):
+        """Atomically write the manifest to disk."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.files = {}
+
+    def get_hash(self, rel_path):
+        entry = self.files.get(rel_path)
+        return entry["hash"] if entry else None
+
+    def get_ids(self, rel_path):
+        entry = self.files.get(rel_path)
+        return list(entry["ids"]) if entry else []
+
+    def set(self, rel_path, content_hash, point_ids):
+        self.files[rel_path] = {"hash": content_hash, "ids": list(point_ids)}
+
+    def remove(self, rel_path):
+        return self.files.pop(rel_path, None)
+
+    def paths(self):
+        return list(self.files)
+
+
+def index_version_path(collection_name):
+    return os.path.join(INDEX_STATE_DIR, "index_versions", collection_name)
+
+
+def bump_index_version(collection_name):
+    """
+    Record that a collection was re-indexed, so that servers sharing
+    INDEX_STATE_DIR can drop what they derived from its previous content.
+    """
+    path = index_version_path(collection_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(uuid.uuid4().hex)
+    os.replace(tmp_path, path)
+
+
+def read_index_version(collection_name):
+    """Return the current index version of a collection, or None if it was never recorded."""
+    try:
+        with open(index_version_path(collection_name), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,82 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Spans from a few milliseconds (embedded search) to long streamed answers
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+REQUESTS = Counter(
+    "chat2code_requests_total", "Chat completion requests.", ["collection"]
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "chat2code_requests_in_flight", "Chat completion requests being streamed.", ["collection"]
+)
+REQUEST_ERRORS = Counter(
+    "chat2code_request_errors_total", "Chat completion requests that failed.", ["collection"]
+)
+STAGE_ERRORS = Counter(
+    "chat2code_stage_errors_total", "Errors raised by each stage of answering.", ["collection", "stage"]
+)
+STAGE_SECONDS = Histogram(
+    "chat2code_stage_seconds",
+    "Time spent in each stage of answering a chat completion request.",
+    ["collection", "stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+TOKENS = Counter(
+    "chat2code_tokens_total", "Tokens sent to and generated by the chat model.", ["collection", "direction"]
+)
+
+
+def render_metrics():
+    """Return the metrics in the Prometheus text format, with its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class RequestTimer:
+    """
+    Times the stages of one answer for the `collection`: each one is observed
+    in the `chat2code_stage_seconds` histogram and kept for the summary logged
+    by `log()`. `started` is the `time.perf_counter()` the request arrived at.
+    """
+
+    def __init__(self, collection, started=None):
+        self.collection = collection
+        self.started = time.perf_counter() if started is None else started
+        self.stages = {}
+
+    def observe(self, stage, seconds):
+        self.stages[stage] = seconds
+        STAGE_SECONDS.labels(self.collection, stage).observe(seconds)
+
+    def since_start(self, stage):
+        """Record the time from the start of the request to now as `stage`."""
+        self.observe(stage, time.perf_counter() - self.started)
+
+    @contextmanager
+    def stage(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            STAGE_ERRORS.labels(self.collection, stage).inc()
+            raise
+        self.observe(stage, time.perf_counter() - start)
+
+    def count_tokens(self, tokens_in, tokens_out):
+        TOKENS.labels(self.collection, "in").inc(tokens_in)
+        TOKENS.labels(self.collection, "out").inc(tokens_out)
+        self.stages["tokens_in"] = tokens_in
+        self.stages["tokens_out"] = tokens_out
+
+    def log(self):
+        timings = " ".join(
+            f"{stage}={value:.3f}s" if isinstance(value, float) else f"{stage}={value}"
+            for stage, value in self.stages.items()
+        )
+        logger.info(f"Answered from {self.collection}: {timings}")
@@ -0,0 +1,92 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from configs.app_configs import PIPELINE_QUEUE_SIZE
+from configs.app_configs import PROCESS_POOL_MIN_ITEMS
+from utils.logger import IndexAttemptSingleton
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def threaded(iterable, maxsize=PIPELINE_QUEUE_SIZE):
+    """
+    Consume `iterable` in a background thread and yield its items through a
+    bounded queue. Chaining stages with this lets each stage run concurrently
+    with the next one, while at most `maxsize` items are buffered between them.
+    Exceptions raised by the producer are re-raised in the consumer, and the
+    producer logs under the index attempt of the consumer.
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+    attempt_id = IndexAttemptSingleton.get_index_attempt_id()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        IndexAttemptSingleton.set_index_attempt_id(attempt_id)
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        # Unblock the producer if the consumer stops early
+        stop.set()
+
+
+
+def ordered_map(fn, iterable, workers=1, min_pool_items=PROCESS_POOL_MIN_ITEMS):
+    """
+    Apply `fn` to every item of `iterable` in a pool of `workers` processes and
+    yield the results in input order. Only a few items per worker are in flight
+    at a time, so `iterable` is consumed lazily. Starting the pool takes
+    seconds, so the first `min_pool_items` items are processed in the calling
+    thread and the pool is only started if more follow. With a single worker
+    `fn` always runs in the calling thread.
+    """
+    iterator = iter(iterable)
+    for item in iterator if workers <= 1 else itertools.islice(iterator, min_pool_items):
+        yield fn(item)
+    first = next(iterator, _DONE)
+    if first is _DONE:
+        return
+
+    # Spawn rather than fork, the pipeline stages run in threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = deque()
+        for item in itertools.chain([first], iterator):
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -1,96 +1,432 @@
 import openai
 import os
-import pathspec
 import subprocess
+import time
+from collections import namedtuple
+from contextlib import nullcontext
 from langchain.document_loaders import TextLoader
-# from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import CharacterTextSplitter
 from langchain_qdrant import Qdrant
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, VectorParams
+from qdrant_client.http.models import PayloadSchemaType, PointIdsList, PointStruct
 from dotenv import load_dotenv
+from utils.chunker import CodeChunker
+from utils.embeddings import CachedEmbeddings, embedding_dimension, get_embeddings
+from utils.index_profile import INDEX_PROFILES
+from utils.logger import IndexAttemptSingleton, setup_logger
+from utils.manifest import (
+    IndexManifest,
+    bump_index_version,
+    chunk_point_ids,
+    default_manifest_path,
+    hash_file,
+)
+from utils.pipeline import ordered_map, threaded
+from utils.progress import IngestionProgress, default_summary_path, new_attempt_id, write_summary
+from utils.qdrant_clients import get_qdrant_client
+from utils.scanner import scan_repository
+from utils.symbols import SYMBOLS_FIELD, tag_symbols
 
 load_dotenv()
 # Set the OpenAI API key
 openai.api_key = os.environ.get("OPENAI_API_KEY")
 openai.api_base = os.environ.get("OPENAI_API_BASE")
 
+logger = setup_logger()
+chunker = CodeChunker()
+
+def _normalize_remote(url):
+    url = url.strip().rstrip("/")
+    if url.endswith(".git"):
+        url = url[: -len(".git")]
+    if os.path.isdir(url):
+        url = os.path.realpath(url)
+    return url
+
+def _git_output(local_path, *args):
+    return subprocess.run(
+        ["git", "-C", local_path, *args], check=True, capture_output=True, text=True
+    ).stdout
+
 def clone_repository(repo_url, local_path):
-    """Clone the specified git repository to the given local path."""
-    subprocess.run(["git", "clone", repo_url, local_path])
+    """
+    Clone the specified git repository to the given local path, or update
+    an existing clone of it there to the remote's default branch, following
+    force-pushes. Raises if `local_path` holds a clone of another repository
+    or has local changes, and if git fails.
+    """
+    if not os.path.isdir(os.path.join(local_path, ".git")):
+        subprocess.run(["git", "clone", repo_url, local_path], check=True)
+        return
+
+    origin = _git_output(local_path, "remote", "get-url", "origin")
+    if _normalize_remote(origin) != _normalize_remote(repo_url):
+        raise ValueError(
+            f"{local_path} is a clone of {origin.strip()}, not {repo_url}; pass another --repo-destination"
+        )
+    if _git_output(local_path, "status", "--porcelain"):
+        raise ValueError(f"{local_path} has local changes, refusing to reset it to {repo_url}")
+    subprocess.run(["git", "-C", local_path, "fetch", "origin", "HEAD"], check=True)
+    subprocess.run(["git", "-C", local_path, "reset", "--hard", "FETCH_HEAD"], check=True)
 
-def load_docs(root_dir, file_extensions=None):
+def iter_repo_files(root_dir, file_extensions=None):
     """
-    Load documents from the specified root directory.
+    Yield the paths of the files to index under the specified root directory.
     Ignore dotfiles, dot directories, and files that match .gitignore rules.
     Optionally filter by file extensions.
     """
+    for rel_path in scan_repository(root_dir):
+        if file_extensions and os.path.splitext(rel_path)[1] not in file_extensions:
+            continue
+        yield os.path.join(root_dir, rel_path)
+
+def load_file(file_path):
+    """Load a single file as documents. Raises if the file cannot be read or decoded."""
+    loader = TextLoader(file_path, encoding="utf-8")
+    return loader.load()
+
+def describe_error(e):
+    """Return a short reason for a file that could not be loaded."""
+    cause = e.__cause__ or e
+    return f"{type(cause).__name__}: {cause}"
+
+def read_file(file_path):
+    """
+    Load a single file, returning `(docs, error)`. Runs in worker processes,
+    so failures are returned as a reason instead of raised.
+    """
+    try:
+        return load_file(file_path), None
+    except Exception as e:
+        return [], describe_error(e)
+
+LoadedFile = namedtuple("LoadedFile", ["rel_path", "content_hash", "texts", "error"])
+
+def load_and_split_file(task):
+    """
+    Load and split one changed file, where `task` is `(file_path, rel_path, content_hash)`.
+    Runs in worker processes, so failures are returned in `error` instead of raised.
+    """
+    file_path, rel_path, content_hash = task
+    try:
+        return LoadedFile(rel_path, content_hash, split_docs(load_file(file_path)), None)
+    except Exception as e:
+        return LoadedFile(rel_path, content_hash, [], describe_error(e))
+
+def load_docs(root_dir, file_extensions=None, workers=1):
+    """
+    Load documents from every file under the specified root directory, using
+    `workers` processes. Files that cannot be loaded are logged and skipped.
+    """
     docs = []
+    file_paths = list(iter_repo_files(root_dir, file_extensions))
+    for file_path, (file_docs, error) in zip(file_paths, ordered_map(read_file, file_paths, workers)):
+        if error:
+            logger.warning(f"Skipped {file_path}: {error}")
+        docs.extend(file_docs)
+    return docs
 
-    # Load .gitignore rules
-    gitignore_path = os.path.join(root_dir, ".gitignore")
+def split_docs(docs):
+    """
+    Split the input documents into token-bounded chunks along syntax boundaries,
+    tagging each chunk with the symbols it defines.
+    """
+    chunks = []
+    for doc in docs:
+        doc_chunks = chunker.split_documents([doc])
+        tag_symbols(doc, doc_chunks)
+        chunks.extend(doc_chunks)
+    return chunks
 
-    if os.path.isfile(gitignore_path):
-        with open(gitignore_path, "r") as gitignore_file:
-            gitignore = gitignore_file.read()
-        spec = pathspec.PathSpec.from_lines(
-            pathspec.patterns.GitWildMatchPattern, gitignore.splitlines()
+def delete_points(db, point_ids):
+    """Delete the given point IDs from the collection behind `db`."""
+    if point_ids:
+        db.client.delete(
+            collection_name=db.collection_name,
+            points_selector=PointIdsList(points=list(point_ids)),
         )
-    else:
-        spec = None
 
-    for dirpath, dirnames, filenames in os.walk(root_dir):
-        # Remove dot directories from the list of directory names
-        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+FileUpdate = namedtuple("FileUpdate", ["rel_path", "content_hash", "point_ids", "stale_ids"])
 
-        for file in filenames:
-            file_path = os.path.join(dirpath, file)
+def iter_file_updates(file_paths, root_dir, manifest, seen, skipped, workers=1, progress=None):
+    """
+    Load and split every file whose content changed since it was recorded in
+    the manifest, yielding `(point_id, chunk)` pairs for the chunks that are not
+    stored yet followed by the file's FileUpdate. Files are loaded by `workers`
+    processes but yielded in walk order. Every relative path is added to `seen`,
+    and `(rel_path, reason)` is appended to `skipped` for files that could not
+    be loaded. Loading is reported to `progress` if given.
 
-            # Skip dotfiles
-            if file.startswith("."):
-                continue
+    Files are hashed in the calling thread, and only the changed ones are sent
+    to the workers, so a run with few changes does not start a process pool.
+    """
 
-            # Skip files that match .gitignore rules
-            if spec and spec.match_file(file_path):
+    def changed_files():
+        for file_path in file_paths:
+            rel_path = os.path.relpath(file_path, root_dir)
+            seen.add(rel_path)
+            try:
+                content_hash = hash_file(file_path)
+            except Exception as e:
+                # Unreadable, keep whatever was indexed before and retry next run
+                error = describe_error(e)
+                logger.warning(f"Skipped {rel_path}: {error}")
+                skipped.append((rel_path, error))
+                content_hash = manifest.get_hash(rel_path)
+            if content_hash == manifest.get_hash(rel_path):
+                if progress is not None:
+                    progress.count("files_loaded")
                 continue
+            yield file_path, rel_path, content_hash
 
-            if file_extensions and os.path.splitext(file)[1] not in file_extensions:
-                continue
+    results = ordered_map(load_and_split_file, changed_files(), workers)
+    if progress is not None:
+        results = progress.track(results, "load_split", "files_loaded")
+    for loaded in results:
+        if loaded.error:
+            logger.warning(f"Skipped {loaded.rel_path}: {loaded.error}")
+            skipped.append((loaded.rel_path, loaded.error))
 
-            try:
-                loader = TextLoader(file_path, encoding="utf-8")
-                docs.extend(loader.load_and_split())
-            except Exception:
-                pass
-    return docs
+        rel_path = loaded.rel_path
+        texts = loaded.texts
+        if progress is not None:
+            progress.count("chunks_produced", len(texts))
+        point_ids = chunk_point_ids(rel_path, [text.page_content for text in texts])
+        old_ids = set(manifest.get_ids(rel_path))
+        for point_id, text in zip(point_ids, texts):
+            if point_id not in old_ids:
+                yield point_id, text
+        yield FileUpdate(rel_path, loaded.content_hash, point_ids, old_ids.difference(point_ids))
 
-def split_docs(docs):
-    """Split the input documents into smaller chunks."""
-    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-    return text_splitter.split_documents(docs)
+def batch_chunks(items, batch_size):
+    """
+    Group the output of iter_file_updates into `(chunks, files)` batches of up
+    to `batch_size` chunks. A file is attached to the batch holding its last
+    chunk, so it is complete once that batch is stored.
+    """
+    chunks = []
+    files = []
+    for item in items:
+        if isinstance(item, FileUpdate):
+            files.append(item)
+            continue
+        chunks.append(item)
+        if len(chunks) >= batch_size:
+            yield chunks, files
+            chunks = []
+            files = []
+    if chunks or files:
+        yield chunks, files
+
+def embed_batches(batches, embeddings, progress=None):
+    """Embed the chunks of each batch, yielding `(chunks, vectors, files)`."""
+    for chunks, files in batches:
+        with progress.stage("embed") if progress is not None else nullcontext():
+            vectors = embeddings.embed_documents([text.page_content for _, text in chunks]) if chunks else []
+        yield chunks, vectors, files
+
+def upsert_chunks(db, chunks, vectors):
+    """Store embedded chunks in the collection behind `db` in the langchain payload layout."""
+    if not chunks:
+        return
+    db.client.upsert(
+        collection_name=db.collection_name,
+        points=[
+            PointStruct(
+                id=point_id,
+                vector={db.vector_name: vector} if db.vector_name else vector,
+                payload={
+                    db.content_payload_key: text.page_content,
+                    db.metadata_payload_key: text.metadata,
+                },
+            )
+            for (point_id, text), vector in zip(chunks, vectors)
+        ],
+    )
 
-def process(repo_url, include_file_extensions, qdrant_collection_name, repo_destination):
+def index_repository(
+    db, manifest, root_dir, file_extensions=None, batch_size=64, workers=1, progress=None
+):
     """
-    Process a git repository by cloning it, filtering files, splitting documents,
-    creating embeddings, and storing everything in a Qdrant collection.
+    Bring the collection behind `db` in line with the files under root_dir.
+    Only chunks that are not already recorded in the manifest are embedded,
+    chunks that disappeared from a changed file and the chunks of removed
+    files are deleted. The manifest is updated in place.
+
+    Walking, loading and splitting, embedding and upserting run as a pipeline
+    of threads connected by bounded queues, so memory use does not depend on
+    the size of the repository and the stages overlap. Files are loaded and
+    split by `workers` processes. Progress and the time spent in each stage are
+    reported to `progress`.
     """
-    clone_repository(repo_url, repo_destination)
+    if progress is None:
+        progress = IngestionProgress()
+    seen = set()
+    skipped = []
+    stats = {"files_changed": 0, "files_removed": 0, "chunks_added": 0, "chunks_deleted": 0}
+
+    def scan():
+        yield from progress.track(iter_repo_files(root_dir, file_extensions), "scan", "files_scanned")
+        progress.scan_finished()
 
-    docs = load_docs(repo_destination, include_file_extensions)
-    texts = split_docs(docs)
+    file_paths = threaded(scan())
+    items = iter_file_updates(file_paths, root_dir, manifest, seen, skipped, workers, progress)
+    batches = threaded(batch_chunks(items, batch_size))
+    for chunks, vectors, files in threaded(embed_batches(batches, db.embeddings, progress)):
+        with progress.stage("upsert"):
+            upsert_chunks(db, chunks, vectors)
+        progress.count("vectors_upserted", len(chunks))
+        stats["chunks_added"] += len(chunks)
+        # Only record files once their chunks are stored
+        for update in files:
+            with progress.stage("delete"):
+                delete_points(db, update.stale_ids)
+            manifest.set(update.rel_path, update.content_hash, update.point_ids)
+            stats["chunks_deleted"] += len(update.stale_ids)
+            stats["files_changed"] += 1
 
-    embeddings = OpenAIEmbeddings()
+    for rel_path in manifest.paths():
+        if rel_path in seen:
+            continue
+        stale_ids = manifest.get_ids(rel_path)
+        with progress.stage("delete"):
+            delete_points(db, stale_ids)
+        manifest.remove(rel_path)
+        stats["chunks_deleted"] += len(stale_ids)
+        stats["files_removed"] += 1
+
+    stats["files_skipped"] = len(skipped)
+    return stats
+
+def prepare_collection(qdrant_client, qdrant_collection_name, manifest, vector_size, full_reload, index_profile):
+    """
+    Make sure the collection can be indexed incrementally, or recreate it with
+    `index_profile` when `full_reload` is set, there is no manifest or
+    collection to build on, or the collection holds vectors of another size.
+    Returns whether the collection was recreated.
+    """
+    if not full_reload and not manifest.exists():
+        logger.info(f"No manifest for collection {qdrant_collection_name}, doing a full reload")
+        full_reload = True
+    if not full_reload and not qdrant_client.collection_exists(qdrant_collection_name):
+        logger.info(f"Collection {qdrant_collection_name} does not exist, doing a full reload")
+        full_reload = True
+    if not full_reload:
+        collection_size = qdrant_client.get_collection(qdrant_collection_name).config.params.vectors.size
+        if collection_size != vector_size:
+            logger.info(
+                f"Collection {qdrant_collection_name} holds vectors of size {collection_size},"
+                f" the embedding model produces {vector_size}, doing a full reload"
+            )
+            full_reload = True
 
-    qdrant_url = os.getenv("QDRANT_URL")
-    qdrant_api_key = os.getenv("QDRANT_API_KEY")
-    qdrant_client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
-    qdrant_client = QdrantClient(url=qdrant_url, timeout=60)
-    qdrant_client.recreate_collection(
+    if full_reload:
+        profile = index_profile or INDEX_PROFILES["default"]
+        # Persist the empty manifest first, so that if the reload fails partway
+        # the next run re-indexes every file instead of trusting the old one
+        manifest.clear()
+        manifest.save()
+        logger.info(f"Creating collection {qdrant_collection_name} with {profile}")
+        profile.create_collection(qdrant_client, qdrant_collection_name, vector_size)
+    elif index_profile is not None:
+        logger.info(f"Updating collection {qdrant_collection_name} to {index_profile}")
+        index_profile.update_collection(qdrant_client, qdrant_collection_name)
+    # Index the symbols defined in each chunk for exact identifier lookups
+    qdrant_client.create_payload_index(
         collection_name=qdrant_collection_name,
-        vectors_config=VectorParams(size=1536, distance="Cosine")  # Manually specify the vector size and distance
+        field_name=f"metadata.{SYMBOLS_FIELD}",
+        field_schema=PayloadSchemaType.KEYWORD,
     )
+    return full_reload
+
+def process(
+    repo_url,
+    include_file_extensions,
+    qdrant_collection_name,
+    repo_destination,
+    full_reload=False,
+    workers=1,
+    index_profile=None,
+    embeddings=None,
+    summary_path=None,
+):
+    """
+    Process a git repository by cloning it, filtering files, splitting documents,
+    creating embeddings, and storing everything in a Qdrant collection.
+
+    By default only files that changed since the previous run are re-embedded,
+    using the manifest kept for the collection. With `full_reload` the collection
+    is dropped and rebuilt from scratch. Files are loaded and split by
+    `workers` processes.
+
+    `index_profile` is the `IndexProfile` new collections are created with,
+    the default profile if None. When given, it is also applied to an existing
+    collection. `embeddings` defaults to `get_embeddings()`.
+
+    The run is logged under a new index attempt ID, with periodic progress and
+    the time spent in each stage. A JSON summary of the run, including failed
+    ones, is written to `summary_path`, by default under the index state
+    directory.
+
+    Returns the indexing stats.
+    """
+    attempt_id = new_attempt_id()
+    previous_attempt_id = IndexAttemptSingleton.get_index_attempt_id()
+    IndexAttemptSingleton.set_index_attempt_id(attempt_id)
+    summary_path = summary_path or default_summary_path(qdrant_collection_name, attempt_id)
+    progress = IngestionProgress()
+    summary = {
+        "attempt_id": attempt_id,
+        "collection": qdrant_collection_name,
+        "repo_url": repo_url,
+        "full_reload": full_reload,
+        "workers": workers,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "status": "failed",
+    }
+    logger.info(f"Indexing {repo_url} into {qdrant_collection_name}")
+
+    try:
+        with progress.stage("clone"):
+            clone_repository(repo_url, repo_destination)
+
+        if embeddings is None:
+            embeddings = get_embeddings()
+
+        with progress.stage("prepare_collection"):
+            vector_size = embedding_dimension(embeddings)
+            qdrant_client = get_qdrant_client(timeout=60)
+            manifest = IndexManifest.load(default_manifest_path(qdrant_collection_name))
+            full_reload = prepare_collection(
+                qdrant_client, qdrant_collection_name, manifest, vector_size, full_reload, index_profile
+            )
+        summary["full_reload"] = full_reload
+
+        db = Qdrant(client=qdrant_client, collection_name=qdrant_collection_name, embeddings=embeddings)
+        with progress.stage("index"):
+            stats = index_repository(
+                db, manifest, repo_destination, include_file_extensions, workers=workers, progress=progress
+            )
+        with progress.stage("save_manifest"):
+            manifest.save()
+        if full_reload or stats["chunks_added"] or stats["chunks_deleted"]:
+            bump_index_version(qdrant_collection_name)
 
-    # client = QdrantClient(url=qdrant_url)
-    db = Qdrant(client=qdrant_client, collection_name=qdrant_collection_name, embeddings=embeddings)
-    db.add_documents(texts)
+        summary["status"] = "succeeded"
+        summary["stats"] = stats
+        logger.info(f"Indexed {qdrant_collection_name}: {stats}")
+        if isinstance(embeddings, CachedEmbeddings):
+            summary["embedding_cache"] = embeddings.cache.stats()
+            logger.info(f"Embedding cache: {summary['embedding_cache']}")
+        return stats
+    except Exception as e:
+        summary["error"] = describe_error(e)
+        raise
+    finally:
+        try:
+            summary["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+            summary.update(progress.summary())
+            progress.log_stage_times()
+            write_summary(summary_path, summary)
+            logger.info(f"Run summary written to {summary_path}")
+        finally:
+            # The thread may go on serving other work, such as API requests
+            IndexAttemptSingleton.set_index_attempt_id(previous_attempt_id)
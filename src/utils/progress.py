@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from configs.app_configs import INDEX_STATE_DIR
+from configs.app_configs import PROGRESS_LOG_INTERVAL_SECONDS
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+
+_last_attempt_id = 0
+_attempt_id_lock = threading.Lock()
+
+
+def new_attempt_id():
+    """
+    Return an ID for an indexing attempt, the start time in milliseconds,
+    bumped when needed so that attempts started together get distinct IDs.
+    """
+    global _last_attempt_id
+    with _attempt_id_lock:
+        _last_attempt_id = max(int(time.time() * 1000), _last_attempt_id + 1)
+        return _last_attempt_id
+
+
+def default_summary_path(collection_name, attempt_id):
+    """Return where the summary of an indexing attempt on `collection_name` is written."""
+    return os.path.join(INDEX_STATE_DIR, "runs", collection_name, f"{attempt_id}.json")
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class IngestionProgress:
+    """
+    Counters and stage timings of one ingestion run, shared by the threads of
+    the indexing pipeline. Progress is logged at most every `interval`
+    seconds, with an ETA once the file scan is complete.
+
+    Stages of the pipeline overlap, so their times are the time each one spent
+    working, and they can add up to more than the wall time of the run.
+    """
+
+    COUNTERS = ["files_scanned", "files_loaded", "chunks_produced", "vectors_upserted"]
+
+    def __init__(self, interval=PROGRESS_LOG_INTERVAL_SECONDS):
+        self.interval = interval
+        self.started = time.monotonic()
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self.stage_seconds = {}
+        self.total_files = None
+        self._last_log = self.started
+        self._lock = threading.Lock()
+
+    def count(self, counter, n=1):
+        with self._lock:
+            self.counts[counter] += n
+            now = time.monotonic()
+            if now - self._last_log < self.interval:
+                return
+            self._last_log = now
+        self.log()
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.monotonic() - start)
+
+    def track(self, iterable, stage, counter=None):
+        """
+        Yield the items of `iterable`, timing the production of each one as
+        `stage` and counting them in `counter`.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.monotonic()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(stage, time.monotonic() - start)
+                return
+            self.add_time(stage, time.monotonic() - start)
+            if counter:
+                self.count(counter)
+            yield item
+
+    def scan_finished(self):
+        """Record that every file was scanned, so that the ETA can be computed."""
+        self.total_files = self.counts["files_scanned"]
+
+    def eta(self):
+        """
+        Return the estimated seconds left, or None before the scan is complete.
+        The share of the work done is the share of the files loaded, scaled
+        down by the chunks still waiting to be embedded and upserted.
+        """
+        counts = self.counts
+        if self.total_files is None or not counts["files_loaded"]:
+            return None
+        done = counts["files_loaded"] / max(self.total_files, 1)
+        if counts["chunks_produced"]:
+            done *= counts["vectors_upserted"] / counts["chunks_produced"]
+        if not done:
+            return None
+        return (time.monotonic() - self.started) * (1 - done) / done
+
+    def log(self):
+        elapsed = time.monotonic() - self.started
+        counts = self.counts
+        files = f"{counts['files_loaded']}/{self.total_files or str(counts['files_scanned']) + '+'} files"
+        eta = self.eta()
+        logger.info(
+            f"Progress: {files}, {counts['chunks_produced']} chunks,"
+            f" {counts['vectors_upserted']} vectors upserted,"
+            f" {counts['files_loaded'] / elapsed if elapsed else 0:.1f} files/s,"
+            f" elapsed {format_duration(elapsed)}, ETA {format_duration(eta) if eta is not None else 'unknown'}"
+        )
+
+    def summary(self):
+        """Return the counters, throughput and stage timings of the run."""
+        elapsed = time.monotonic() - self.started
+        return {
+            "wall_seconds": round(elapsed, 3),
+            **self.counts,
+            "files_per_second": round(self.counts["files_loaded"] / elapsed, 2) if elapsed else None,
+            "chunks_per_second": round(self.counts["chunks_produced"] / elapsed, 2) if elapsed else None,
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+        }
+
+    def log_stage_times(self):
+        timings = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in self.stage_seconds.items())
+        logger.info(f"Stage times: {timings}")
+
+
+def write_summary(path, summary):
+    """Atomically write a run summary as JSON."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,90 @@
+import functools
+import os
+import threading
+
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+from configs.app_configs import QDRANT_PATH
+
+# Embedded storage can only be opened once per process, so its client is shared
+_embedded_clients = {}
+_lock = threading.Lock()
+
+
+class _SerializedStorage:
+    """
+    Proxy to the local storage behind an embedded `QdrantClient` that runs one
+    call at a time. The local storage is not thread-safe, and the API server
+    and scheduler search and write through the shared client from several
+    threads. Each call holds the lock only while it runs, so searches go on
+    between the batches of an ingestion.
+    """
+
+    def __init__(self, storage):
+        self._storage = storage
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._storage, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def serialized(*args, **kwargs):
+            with self._lock:
+                return attribute(*args, **kwargs)
+
+        return serialized
+
+
+def is_embedded():
+    """Return whether Qdrant runs embedded in this process rather than as a server."""
+    return bool(QDRANT_PATH)
+
+
+def get_qdrant_client(**kwargs):
+    """
+    Return the Qdrant client used by ingestion, the chat app and the API server.
+    With `QDRANT_PATH` set, this is a client over the embedded storage at that
+    path (or in memory for ":memory:"), shared by every caller of the process,
+    whose calls run one at a time.
+    Otherwise a client for the `QDRANT_URL` server, authenticated with
+    `QDRANT_API_KEY`; keyword arguments (e.g. `timeout`, `limits`) are passed
+    to it.
+    """
+    if is_embedded():
+        with _lock:
+            client = _embedded_clients.get(QDRANT_PATH)
+            if client is None:
+                if QDRANT_PATH == ":memory:":
+                    client = QdrantClient(location=":memory:")
+                else:
+                    client = QdrantClient(path=QDRANT_PATH)
+                # Every method of QdrantClient delegates to its storage client
+                client._client = _SerializedStorage(client._client)
+                _embedded_clients[QDRANT_PATH] = client
+            return client
+    return QdrantClient(
+        url=os.environ.get("QDRANT_URL"), api_key=os.environ.get("QDRANT_API_KEY"), **kwargs
+    )
+
+
+def get_async_qdrant_client(**kwargs):
+    """
+    Return an AsyncQdrantClient for the `QDRANT_URL` server, or None in
+    embedded mode, where searches go through the shared sync client.
+    """
+    if is_embedded():
+        return None
+    return AsyncQdrantClient(
+        url=os.environ.get("QDRANT_URL"), api_key=os.environ.get("QDRANT_API_KEY"), **kwargs
+    )
+
+
+def close_qdrant_client(client):
+    """Close a client from `get_qdrant_client`, releasing the embedded storage if it is shared."""
+    with _lock:
+        for path, embedded_client in list(_embedded_clients.items()):
+            if embedded_client is client:
+                del _embedded_clients[path]
+    client.close()
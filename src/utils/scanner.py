@@ -0,0 +1,115 @@
+import os
+import subprocess
+
+import pathspec
+
+# Mode git uses for submodule entries in the index
+_GITLINK_MODE = "160000"
+
+
+def list_git_files(root_dir):
+    """
+    List the files tracked in the git index of the clone at root_dir, as paths
+    relative to root_dir. Returns None if root_dir is not a git work tree or
+    git is unavailable, so callers can fall back to walking the file system.
+    """
+    if not os.path.exists(os.path.join(root_dir, ".git")):
+        return None
+    try:
+        result = subprocess.run(
+            ["git", "-C", root_dir, "ls-files", "-z", "--stage"],
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    files = []
+    for entry in result.stdout.split(b"\0"):
+        if not entry:
+            continue
+        info, path = entry.split(b"\t", 1)
+        mode, _, stage = info.split(b" ")
+        # Skip submodules and the extra entries of unmerged paths
+        if mode.decode() == _GITLINK_MODE or stage not in (b"0", b"2"):
+            continue
+        files.append(os.fsdecode(path))
+    return files
+
+
+def _load_ignore_spec(path):
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return pathspec.GitIgnoreSpec.from_lines(f.read().splitlines())
+
+
+def _is_ignored(specs, rel_path, is_dir):
+    """
+    Check `rel_path` against the ignore specs of its ancestor directories.
+    The deepest .gitignore with a matching pattern decides, as in git.
+    """
+    for base, spec in reversed(specs):
+        path = rel_path[len(base) + 1 :] if base else rel_path
+        if is_dir:
+            path += "/"
+        include = spec.check_file(path).include
+        if include is not None:
+            return include
+    return False
+
+
+def walk_files(root_dir):
+    """
+    Walk root_dir and yield the paths, relative to root_dir, of files that are
+    not ignored by any .gitignore on the way down (and .git/info/exclude).
+    Ignored and dot directories are pruned before descending into them.
+    """
+    root_specs = []
+    exclude_spec = _load_ignore_spec(os.path.join(root_dir, ".git", "info", "exclude"))
+    if exclude_spec:
+        root_specs.append(("", exclude_spec))
+
+    # Ignore specs in effect for each directory, keyed by its relative path
+    specs_by_dir = {"": root_specs}
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        rel_dir = os.path.relpath(dirpath, root_dir).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir
+
+        specs = specs_by_dir.pop(rel_dir)
+        spec = _load_ignore_spec(os.path.join(dirpath, ".gitignore"))
+        if spec:
+            specs = specs + [(rel_dir, spec)]
+
+        kept = []
+        for dirname in sorted(dirnames):
+            rel_path = f"{rel_dir}/{dirname}" if rel_dir else dirname
+            if dirname.startswith(".") or _is_ignored(specs, rel_path, is_dir=True):
+                continue
+            specs_by_dir[rel_path] = specs
+            kept.append(dirname)
+        dirnames[:] = kept
+
+        for filename in sorted(filenames):
+            rel_path = f"{rel_dir}/{filename}" if rel_dir else filename
+            if not _is_ignored(specs, rel_path, is_dir=False):
+                yield rel_path
+
+
+def _is_hidden(rel_path):
+    return any(part.startswith(".") for part in rel_path.split("/"))
+
+
+def scan_repository(root_dir):
+    """
+    Yield the paths, relative to root_dir, of the files in a repository,
+    skipping dotfiles and anything inside dot directories.
+    Uses the git index when root_dir is a clone and falls back to walking the
+    file system with nested .gitignore support otherwise.
+    """
+    files = list_git_files(root_dir)
+    if files is None:
+        files = walk_files(root_dir)
+    for rel_path in files:
+        if not _is_hidden(rel_path):
+            yield rel_path
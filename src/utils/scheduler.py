@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from configs.app_configs import SCHEDULER_MAX_ERROR_BACKOFF_SECONDS
+from configs.app_configs import SCHEDULER_MAX_IDLE_INTERVAL_SECONDS
+from configs.app_configs import SCHEDULER_PER_HOST_CONCURRENCY
+from configs.app_configs import SCHEDULER_POLL_INTERVAL_SECONDS
+from configs.app_configs import SCHEDULER_WORKERS
+from connectors.state_store import ConnectorStateStore
+from utils.checkpoint import IndexCheckpoint, default_checkpoint_path
+from utils.connector_indexing import index_documents
+from utils.logger import setup_logger
+from utils.progress import format_duration
+from utils.qdrant_clients import is_embedded
+
+logger = setup_logger()
+
+# Polls start this much before the previous end, covering clock skew with the source
+_WATERMARK_OVERLAP_SECONDS = 60
+
+# Longest wait of the scheduler loop, so that a stop request is noticed quickly
+_MAX_SLEEP_SECONDS = 1.0
+
+
+class PollJob:
+    """
+    A `PollConnector` kept fresh by the scheduler, indexing into
+    `collection_name`. `key` names the connector in watermarks, checkpoints
+    and logs, and `host` is the source server its polls count against.
+    """
+
+    def __init__(self, key, connector, collection_name, host):
+        self.key = key
+        self.connector = connector
+        self.collection_name = collection_name
+        self.host = host
+        self.next_poll = 0.0
+        self.idle_polls = 0
+        self.failures = 0
+        self.running = False
+
+
+class PollScheduler:
+    """
+    Polls many connectors concurrently and indexes what they return, with at
+    most `workers` polls at once and `per_host` per source host.
+
+    The `end` of each connector's last successful poll is stored on disk as
+    its watermark, and the next poll starts from there, so a restart picks up
+    where the previous process stopped. Connectors with changes are polled
+    every `interval` seconds. Each poll that finds nothing doubles the wait up
+    to `max_idle_interval`, and each failure doubles it up to
+    `max_error_backoff`. Waits are jittered so the fleet spreads out.
+
+    Every poll indexes with the same `embeddings` and `qdrant_client`. With
+    embedded Qdrant storage, polls still fetch concurrently but store their
+    batches one at a time.
+    """
+
+    def __init__(
+        self,
+        jobs,
+        interval=SCHEDULER_POLL_INTERVAL_SECONDS,
+        max_idle_interval=SCHEDULER_MAX_IDLE_INTERVAL_SECONDS,
+        max_error_backoff=SCHEDULER_MAX_ERROR_BACKOFF_SECONDS,
+        workers=SCHEDULER_WORKERS,
+        per_host=SCHEDULER_PER_HOST_CONCURRENCY,
+        state_store=None,
+        embeddings=None,
+        qdrant_client=None,
+    ):
+        self.jobs = list(jobs)
+        self.interval = interval
+        self.max_idle_interval = max(max_idle_interval, interval)
+        self.max_error_backoff = max(max_error_backoff, interval)
+        self.workers = max(workers, 1)
+        self.per_host = max(per_host, 1)
+        self.state_store = state_store or ConnectorStateStore()
+        self.embeddings = embeddings
+        self.qdrant_client = qdrant_client
+        self._checkpoints = {}
+        self._in_flight = Counter()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock() if is_embedded() else None
+
+    def _watermark_key(self, job):
+        return f"watermark:{job.key}"
+
+    def _checkpoint(self, collection_name):
+        with self._lock:
+            checkpoint = self._checkpoints.get(collection_name)
+            if checkpoint is None:
+                checkpoint = IndexCheckpoint(default_checkpoint_path(collection_name))
+                self._checkpoints[collection_name] = checkpoint
+            return checkpoint
+
+    def poll(self, job):
+        """Poll one connector from its watermark to now, index the result and advance the watermark."""
+        watermark = self.state_store.get(self._watermark_key(job))
+        start = max(watermark - _WATERMARK_OVERLAP_SECONDS, 0) if watermark else 0
+        end = time.time()
+        stats = index_documents(
+            job.connector.poll_source(start, end),
+            job.collection_name,
+            job.key,
+            embeddings=self.embeddings,
+            checkpoint=self._checkpoint(job.collection_name),
+            qdrant_client=self.qdrant_client,
+            write_lock=self._write_lock,
+        )
+        self.state_store.set(self._watermark_key(job), end)
+        return stats
+
+    def _delay(self, job, stats, error):
+        if error is not None:
+            job.failures += 1
+            return min(self.interval * 2 ** min(job.failures, 20), self.max_error_backoff)
+        job.failures = 0
+        if stats["documents_indexed"] or stats["documents_deleted"]:
+            job.idle_polls = 0
+        else:
+            job.idle_polls += 1
+        return min(self.interval * 2 ** min(job.idle_polls, 20), self.max_idle_interval)
+
+    def _run_job(self, job):
+        stats = None
+        error = None
+        try:
+            stats = self.poll(job)
+        except Exception as e:
+            error = e
+        delay = self._delay(job, stats, error) * random.uniform(0.9, 1.1)
+        if error is not None:
+            logger.error(
+                f"Polling {job.key} failed ({job.failures} in a row), retrying in"
+                f" {format_duration(delay)}: {type(error).__name__}: {error}"
+            )
+        else:
+            logger.info(
+                f"Polled {job.key}: {stats['documents_indexed']} documents indexed,"
+                f" {stats['documents_deleted']} deleted, next poll in {format_duration(delay)}"
+            )
+        with self._lock:
+            job.next_poll = time.monotonic() + delay
+            job.running = False
+            self._in_flight[job.host] -= 1
+        self._wakeup.set()
+
+    def _start_due_jobs(self, executor):
+        """
+        Start the due jobs that fit in the concurrency limits, most overdue
+        first. Returns when the next job that could start is due; jobs held
+        back by a limit wait for a running poll to finish instead.
+        """
+        now = time.monotonic()
+        next_due = now + self.interval
+        with self._lock:
+            running = sum(self._in_flight.values())
+            for job in sorted(self.jobs, key=lambda job: job.next_poll):
+                if running >= self.workers:
+                    break
+                if job.running or self._in_flight[job.host] >= self.per_host:
+                    continue
+                if job.next_poll > now:
+                    next_due = min(next_due, job.next_poll)
+                    break
+                job.running = True
+                self._in_flight[job.host] += 1
+                running += 1
+                executor.submit(self._run_job, job)
+        return next_due
+
+    def run(self):
+        """Poll the connectors until `stop()` is called, then wait for the polls in progress."""
+        logger.info(
+            f"Scheduling {len(self.jobs)} connectors, {self.workers} polls at once"
+            f" and {self.per_host} per host"
+        )
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while not self._stop.is_set():
+                self._wakeup.clear()
+                next_due = self._start_due_jobs(executor)
+                timeout = min(max(next_due - time.monotonic(), 0.0), _MAX_SLEEP_SECONDS)
+                self._wakeup.wait(timeout)
+        logger.info("Scheduler stopped")
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
@@ -0,0 +1,72 @@
+import asyncio
+
+
+class _Flight:
+    def __init__(self):
+        self.pieces = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Event()
+        self.task = None
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class StreamCoalescer:
+    """
+    Single-flight for streamed answers: concurrent subscribers with the same
+    key share one upstream async iterator. Each subscriber gets its own
+    iterator over every piece the upstream produced, from the first one, so
+    late joiners catch up before following live. The upstream runs as a task
+    that finishes even if its subscribers go away.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def in_flight(self):
+        return len(self._flights)
+
+    def subscribe(self, key, start):
+        """
+        Return an async iterator over the pieces of the flight for `key`,
+        calling `start()` to open the upstream iterator if none is in flight.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            self.started += 1
+            # Keep a reference to the task, the event loop only holds a weak one
+            flight.task = asyncio.create_task(self._run(key, flight, start()))
+        else:
+            self.coalesced += 1
+        return self._follow(flight)
+
+    async def _run(self, key, flight, upstream):
+        try:
+            async for piece in upstream:
+                flight.pieces.append(piece)
+                flight.notify()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._flights.pop(key, None)
+            flight.notify()
+
+    async def _follow(self, flight):
+        index = 0
+        while True:
+            while index < len(flight.pieces):
+                yield flight.pieces[index]
+                index += 1
+            if flight.done:
+                break
+            await flight.changed.wait()
+        if flight.error is not None:
+            raise flight.error
@@ -0,0 +1,157 @@
+import ast
+import os
+import re
+from bisect import bisect_right
+
+from langchain.docstore.document import Document
+from qdrant_client.http.models import FieldCondition, Filter, MatchAny
+
+# Payload field of the chunk metadata holding the symbols defined in the chunk
+SYMBOLS_FIELD = "symbols"
+
+# Definitions in languages without a parser here: class/function keywords and C-like methods
+_DEFINITION_PATTERNS = [
+    re.compile(
+        r"^\s*(?:export\s+)?(?:default\s+)?(?:public\s+|private\s+|protected\s+|internal\s+)?"
+        r"(?:abstract\s+|static\s+|final\s+|sealed\s+|data\s+|async\s+|pub(?:\([^)]*\))?\s+)*"
+        r"(?:class|interface|enum|struct|trait|object|record|type|def|func|function|fn|fun|module)"
+        r"\s+\*?([A-Za-z_$][\w$]*)",
+        re.MULTILINE,
+    ),
+    # Go methods: func (r *Receiver) Name(
+    re.compile(r"^\s*func\s+\([^)]*\)\s*([A-Za-z_]\w*)\s*\(", re.MULTILINE),
+    # Java/C#/C++ style methods: modifiers, a return type, then name(...) {
+    re.compile(
+        r"^\s*(?:(?:public|private|protected|static|final|abstract|synchronized|virtual|override|async)\s+)+"
+        r"[\w<>\[\],.?\s]+?\s+([A-Za-z_]\w*)\s*\([^;{]*\)\s*(?:throws\s+[\w.,\s]+)?\{",
+        re.MULTILINE,
+    ),
+    # JS/TS functions assigned to constants
+    re.compile(
+        r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)",
+        re.MULTILINE,
+    ),
+]
+
+# Identifiers, possibly qualified with `.`, `::` or `#`. ASCII only, so that an
+# identifier followed by CJK text without a space is not merged with it
+_IDENTIFIER = re.compile(r"[A-Za-z_$][\w$]*(?:(?:\.|::|#)[A-Za-z_$][\w$]*)*", re.ASCII)
+_BACKTICKED = re.compile(r"`([^`]+)`")
+
+
+def _python_definitions(text):
+    """Return `(qualified_name, line)` for the classes and functions of a Python module."""
+    definitions = []
+
+    def visit(nodes, prefix):
+        for node in nodes:
+            if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                name = f"{prefix}{node.name}"
+                definitions.append((name, node.lineno))
+                visit(node.body, f"{name}.")
+
+    visit(ast.parse(text).body, "")
+    return definitions
+
+
+def _generic_definitions(text):
+    definitions = []
+    for pattern in _DEFINITION_PATTERNS:
+        for match in pattern.finditer(text):
+            line = text.count("\n", 0, match.start(1)) + 1
+            definitions.append((match.group(1), line))
+    return definitions
+
+
+def extract_definitions(text, file_path=""):
+    """Return `(qualified_name, line)` for the definitions found in a source file."""
+    if os.path.splitext(file_path)[1].lower() == ".py":
+        try:
+            return _python_definitions(text)
+        except (SyntaxError, ValueError, RecursionError):
+            pass
+    return _generic_definitions(text)
+
+
+def _names(qualified_name):
+    """Return the names a definition can be looked up by, e.g. `A.b` and `b`."""
+    short_name = qualified_name.rsplit(".", 1)[-1]
+    return [qualified_name] if short_name == qualified_name else [qualified_name, short_name]
+
+
+def tag_symbols(doc, chunks):
+    """
+    Record in each chunk's metadata the symbols defined in it, using the
+    `start_line` metadata the chunker sets on the chunks of `doc`.
+    """
+    definitions = extract_definitions(doc.page_content, doc.metadata.get("source", ""))
+    starts = [chunk.metadata.get("start_line", 1) for chunk in chunks]
+    symbols = [[] for _ in chunks]
+    for qualified_name, line in definitions:
+        # The chunk holding a definition is the last one starting at or before its line
+        index = bisect_right(starts, line) - 1
+        if index >= 0:
+            symbols[index].extend(_names(qualified_name))
+    for chunk, chunk_symbols in zip(chunks, symbols):
+        chunk.metadata[SYMBOLS_FIELD] = sorted(set(chunk_symbols))
+
+
+def _looks_like_code(identifier):
+    return (
+        "_" in identifier
+        or "." in identifier
+        or "::" in identifier
+        or "#" in identifier
+        or re.search(r"[a-z][A-Z]", identifier) is not None
+        or (re.search(r"[A-Z].*[A-Z]", identifier) is not None and not identifier.isupper())
+    )
+
+
+def find_identifiers(question):
+    """
+    Return the code-like identifiers mentioned in a question: anything in
+    backticks, plus snake_case, camelCase, PascalCase and dotted names.
+    """
+    identifiers = []
+    for quoted in _BACKTICKED.findall(question):
+        identifiers.extend(_IDENTIFIER.findall(quoted))
+    unquoted = _BACKTICKED.sub(" ", question)
+    identifiers.extend(i for i in _IDENTIFIER.findall(unquoted) if _looks_like_code(i))
+
+    seen = []
+    for identifier in identifiers:
+        identifier = identifier.replace("::", ".").replace("#", ".").strip(".")
+        if identifier and identifier not in seen:
+            seen.append(identifier)
+    return seen
+
+
+def lookup_symbols(db, identifiers, limit=10):
+    """
+    Fetch the chunks defining any of `identifiers` from the collection behind
+    `db` through the payload index, without embedding anything. Qualified names
+    that are not indexed are retried by their last component.
+    """
+    if not identifiers:
+        return []
+    key = f"{db.metadata_payload_key}.{SYMBOLS_FIELD}"
+    candidates = [identifiers, [i.rsplit(".", 1)[-1] for i in identifiers if "." in i]]
+    for names in candidates:
+        if not names:
+            continue
+        points, _ = db.client.scroll(
+            collection_name=db.collection_name,
+            scroll_filter=Filter(must=[FieldCondition(key=key, match=MatchAny(any=names))]),
+            limit=limit,
+            with_payload=True,
+            with_vectors=False,
+        )
+        if points:
+            return [
+                Document(
+                    page_content=point.payload.get(db.content_payload_key, ""),
+                    metadata=point.payload.get(db.metadata_payload_key) or {},
+                )
+                for point in points
+            ]
+    return []
@@ -0,0 +1,26 @@
+from configs.app_configs import CHUNK_TOKENIZER
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+_encoding = None
+
+
+def count_tokens(text):
+    """
+    Count the tokens of `text` with tiktoken. Falls back to an estimate of
+    four characters per token if the encoding cannot be loaded (e.g. offline
+    without a tiktoken cache).
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding(CHUNK_TOKENIZER)
+        except Exception as e:
+            logger.warning(f"Could not load tiktoken encoding {CHUNK_TOKENIZER}, estimating tokens: {e}")
+            _encoding = False
+    if _encoding is False:
+        return (len(text) + 3) // 4
+    return len(_encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,5 @@
+# `utils` is split between src/utils and the repository root utils package
+# (logger, text_processing), merge both so either can be imported as `utils.*`.
+from pkgutil import extend_path
+
+__path__ = extend_path(__path__, __name__)
@@ -1,5 +1,6 @@
 import logging
 import os
+import threading
 from collections.abc import MutableMapping
 from typing import Any
 
@@ -11,15 +12,18 @@ class IndexAttemptSingleton:
     unique identifier for this indexing attempt. For things like the API server,
     main background job (scheduler), etc. this will not be used."""
 
-    _INDEX_ATTEMPT_ID: None | int = None
+    # Attempts run concurrently by the poll scheduler and the API server each
+    # have their own thread, and threads outside an attempt log without an ID
+    _THREAD_LOCAL = threading.local()
 
     @classmethod
     def get_index_attempt_id(cls) -> None | int:
-        return cls._INDEX_ATTEMPT_ID
+        return getattr(cls._THREAD_LOCAL, "index_attempt_id", None)
 
     @classmethod
-    def set_index_attempt_id(cls, index_attempt_id: int) -> None:
-        cls._INDEX_ATTEMPT_ID = index_attempt_id
+    def set_index_attempt_id(cls, index_attempt_id: None | int) -> None:
+        """Set the attempt ID for the current thread, or clear it with None."""
+        cls._THREAD_LOCAL.index_attempt_id = index_attempt_id
 
 
 def get_log_level_from_str(log_level_str: str = LOG_LEVEL) -> int: